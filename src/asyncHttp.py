@@ -0,0 +1,44 @@
+import aiohttp
+from yarl import URL
+
+# asyncio HTTP client shared by the async variants of the Spotlight, SPARQL and similarity clients
+#
+# All the requests made through one client share a single aiohttp session, so one event loop can
+# keep hundreds of requests in flight over a bounded number of keep-alive connections
+class AsyncHttpClient:
+
+	def __init__(self,maxConnections=100,timeout=30):
+		self.maxConnections = maxConnections				# Number of connections opened at the same time
+		self.timeout = timeout								# Total timeout of a request (seconds)
+		self.session = None									# Created in the event loop on first use
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self,excType,excValue,traceback):
+		await self.close()
+
+	def getSession(self):
+		if self.session is None:
+			connector = aiohttp.TCPConnector(limit=self.maxConnections)
+			self.session = aiohttp.ClientSession(connector=connector,timeout=aiohttp.ClientTimeout(total=self.timeout))
+		return self.session
+
+	# Performs a GET request and returns the body of the response
+	# The URLs built by the clients are already encoded
+	# Raises an IOError if the request fails or the status is not 2xx
+	async def get(self,url,headers=None):
+		try:
+			async with self.getSession().get(URL(url,encoded=True),headers=headers) as response:
+				body = await response.read()
+		except (aiohttp.ClientError,OSError) as e:
+			raise IOError(str(e))
+
+		if(response.status<200 or response.status>=300):
+			raise IOError(url + ' returned HTTP ' + str(response.status))
+		return body
+
+	async def close(self):
+		if self.session is not None:
+			await self.session.close()
+			self.session = None
@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import argparse
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ProcessPoolExecutor
+import graphSearch
+
+# Batch search
+#
+# Runs the keyword queries of a file on a pool of processes and writes one JSON record per query
+# (JSON lines), in the order of the file. The input is either
+#	- a text file with one query per line. Empty lines, lines starting with '#' and indented lines
+#	  are ignored, and so are the search results pasted between the queries of a notes file such as
+#	  queries.txt (see isResultLine). A query occurring several times is searched once.
+#	- a QALD XML file, the <keyword_query> of each <query> is searched (saq-2015_training_set.xml)
+#
+# The worker processes share the on-disk SPARQL cache and similarity store, so a pivot element or a
+# pair of words fetched by one worker is not fetched again by the others.
+#
+# Usage : python3 batchSearch.py queries.txt [--output results.jsonl] [--processes 4] [search options of graphSearch.py]
+
+# Returns the list of (id,query) of the file
+def readQueries(path):
+	queries = []
+
+	if(path.endswith('.xml')):
+		root = ElementTree.parse(path).getroot()
+		for index,query in enumerate(root.iter('query')):
+			keywordQuery = query.find('keyword_query')
+			if keywordQuery is not None and keywordQuery.text and keywordQuery.text.strip():
+				queries.append((query.get('id',str(index+1)),keywordQuery.text.strip()))
+		return queries
+
+	seen = set()
+	with open(path,encoding='utf-8') as queryFile:
+		for line in queryFile:
+			if(line.strip()=='' or line[0].isspace() or line.startswith('#') or isResultLine(line) or line.strip() in seen):
+				continue
+			seen.add(line.strip())
+			queries.append((str(len(queries)+1),line.strip()))
+	return queries
+
+# Returns True for the lines printed by graphSearch.py rather than typed as queries : separators,
+# scores, colors, fact nodes, progress messages and URLs
+def isResultLine(line):
+	line = line.strip()
+	if(line.startswith(('-','<','[')) or ' : ' in line or '://' in line or '--->' in line):
+		return True
+	try:
+		float(line)
+		return True
+	except ValueError:
+		return False
+
+
+# Options of the worker processes, set by initializeWorker
+workerArgs = None
+
+# Configures the search once per worker process
+def initializeWorker(args):
+	global workerArgs
+	workerArgs = args
+	# The search reports its progress on stdout, which is reserved for the records
+	sys.stdout = open(os.devnull,'w')
+	graphSearch.configureSearch(args)
+
+# Searches one query in a worker process and returns its record
+def searchQuery(query):
+	queryId,sentence = query
+	try:
+		context = graphSearch.search(sentence,width=workerArgs.width,maxDepth=workerArgs.max_depth,maxFactNodes=workerArgs.max_fact_nodes,topK=workerArgs.limit)
+		record = context.toDict(workerArgs.limit)
+	except Exception as e:
+		record = {'query':sentence,'error':str(e)}
+
+	record['id'] = queryId
+	return record
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Batch keyword search over DBPedia')
+	parser.add_argument('input',help='Text file with one query per line, or QALD XML file')
+	parser.add_argument('--output',help='JSON lines file receiving the records (default: standard output)')
+	parser.add_argument('--processes',type=int,default=os.cpu_count(),help='Number of worker processes')
+	parser.add_argument('--limit',type=int,default=50,help='Number of fact nodes kept in each record')
+	graphSearch.addSearchArguments(parser)
+	args = parser.parse_args()
+	# The worker processes cannot append to the same archive
+	if args.record:
+		parser.error('--record is not supported by the batch search, record the queries with benchmark.py or graphSearch.py')
+
+	queries = readQueries(args.input)
+	output = open(args.output,'w',encoding='utf-8') if args.output else sys.stdout
+
+	with ProcessPoolExecutor(max_workers=args.processes,initializer=initializeWorker,initargs=(args,)) as executor:
+		# map() yields the records in the order of the file, each one as soon as it (and the ones before it) are done
+		for record in executor.map(searchQuery,queries):
+			output.write(json.dumps(record)+'\n')
+			output.flush()
+
+	if output is not sys.stdout:
+		output.close()
+
+if __name__ == '__main__':
+	main()
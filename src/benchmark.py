@@ -0,0 +1,207 @@
+import os
+import json
+import math
+import time
+import argparse
+import contextlib
+import threading
+import xml.etree.ElementTree as ElementTree
+from pivotEntityRecognition import PivotEntityRecognition
+from sparqlClient import SparqlClient
+from sparqlCache import SparqlCache
+from wordSimilarity import WordSimilarity
+from searchContext import SearchContext
+import graphSearch
+
+# Latency benchmark over the QALD-5 training set
+#
+# Runs every keyword query of saq-2015_training_set.xml through the four phases of the search and
+# writes a JSON report with
+#	- the p50/p95/max latency of each phase (seconds)
+#	- the number of HTTP calls made to Spotlight, the SPARQL endpoint and the similarity services
+#	- the number of triples fetched, predicates scored and fact nodes created (see instrumentation.py)
+#	- the recall of the gold answers among the first 'limit' fact nodes of each query
+#
+# The services are answered from recorded fixtures, either
+#	- a directory holding the Spotlight responses, the SPARQL results and the similarity scores
+#	  (SQLite files that never expire). A request that is not in the fixtures is sent to the live
+#	  service and recorded. The first run over an empty directory records the fixtures, the
+#	  following ones replay them without a single HTTP call, which the report shows.
+#	- an archive of the responses (see transport.py) made with --record and replayed with --replay.
+#	  Every request reaches the archive, after the latency given by --replay-latency.
+#
+# Usage : python3 benchmark.py [saq-2015_training_set.xml] [--fixtures benchmarkFixtures] [--output benchmark.json] [--repeat 3] [search options of graphSearch.py]
+#         python3 benchmark.py --replay benchmark.gz --replay-latency recorded
+
+# Fixtures are recorded once and never expire
+fixtureTtl = 100*365*86400
+fixtureSize = 1000000
+
+# Returns the list of (id,query,gold answers) of a QALD XML file
+def readDataset(path):
+	dataset = []
+	root = ElementTree.parse(path).getroot()
+	for index,query in enumerate(root.iter('query')):
+		keywordQuery = query.find('keyword_query')
+		if keywordQuery is None or not keywordQuery.text or not keywordQuery.text.strip():
+			continue
+		answers = [answer.text.strip() for answer in query.iter('answer') if answer.text and answer.text.strip()]
+		dataset.append((query.get('id',str(index+1)),keywordQuery.text.strip(),answers))
+	return dataset
+
+# Counts the requests that reach a transport
+class CountingTransport:
+
+	def __init__(self,transport):
+		self.transport = transport					# Transport performing the requests
+		self.calls = 0								# Number of requests made so far
+		self.lock = threading.Lock()
+
+	def get(self,url,headers=None):
+		with self.lock:
+			self.calls += 1
+		return self.transport.get(url,headers)
+
+	def close(self):
+		self.transport.close()
+
+# Sets up the search as graphSearch.py does, with the fixtures as caches, and counts the requests
+def configureFixtures(args):
+	# Outside of record and replay, the SPARQL cache and the similarity store are the ones of the fixtures
+	if not (args.record or args.replay):
+		os.makedirs(args.fixtures,exist_ok=True)
+		args.sparql_cache = os.path.join(args.fixtures,'sparql.db')
+		args.similarity_store = os.path.join(args.fixtures,'similarity.db')
+		args.cache_ttl = fixtureTtl
+		args.cache_size = fixtureSize
+		PivotEntityRecognition.cache = SparqlCache(os.path.join(args.fixtures,'spotlight.db'),ttl=fixtureTtl,maxEntries=fixtureSize)
+
+	graphSearch.configureSearch(args)
+	SearchContext.instrument = True
+
+	PivotEntityRecognition.transport = CountingTransport(PivotEntityRecognition.transport)
+	SparqlClient.transport = CountingTransport(SparqlClient.transport)
+	client = WordSimilarity.getClient()
+	client.transport = CountingTransport(client.transport)
+
+# Returns the number of requests that reached the transport so far, per service
+def getHttpCalls():
+	calls = {}
+	calls['spotlight'] = PivotEntityRecognition.transport.calls
+	calls['sparql'] = SparqlClient.transport.calls
+	calls['similarity'] = WordSimilarity.client.transport.calls
+	return calls
+
+# Returns the URIs and literal values of the subjects and objects of the fact nodes
+def getAnswers(factNodes):
+	answers = set()
+	for factNode in factNodes:
+		for resource in (factNode.subject,factNode.object):
+			answers.add(resource.uri.strip('<>'))
+	return answers
+
+# Returns the fraction of the gold answers found, None if the query has no gold answer
+def getRecall(goldAnswers,answers):
+	if(len(goldAnswers)==0):
+		return None
+	found = [answer for answer in goldAnswers if answer in answers]
+	return len(found)/len(goldAnswers)
+
+# Nearest-rank percentile of a list of values
+def percentile(values,p):
+	values = sorted(values)
+	index = max(0,int(math.ceil(p/100*len(values)))-1)
+	return values[index]
+
+# Runs one query and returns its record
+def runQuery(queryId,sentence,goldAnswers,args):
+	record = {'id':queryId,'query':sentence}
+	before = getHttpCalls()
+
+	try:
+		# The search reports its progress on stdout, which is reserved for the summary
+		with open(os.devnull,'w') as devnull, contextlib.redirect_stdout(devnull):
+			context = graphSearch.search(sentence,width=args.width,maxDepth=args.max_depth,maxFactNodes=args.max_fact_nodes,topK=args.top_k or args.limit)
+		record['timings'] = context.timings
+		record['count'] = context.factNodeCount
+		record['recall'] = getRecall(goldAnswers,getAnswers(context.resultsList[:args.limit]))
+		record['counters'] = context.instrumentation.toDict()['counters']
+	except Exception as e:
+		record['error'] = str(e)
+
+	after = getHttpCalls()
+	record['httpCalls'] = {service:after[service]-before[service] for service in after}
+	return record
+
+# Aggregates the records of all the runs into the report
+def getReport(records,args):
+	report = {}
+	report['date'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+	report['dataset'] = args.dataset
+	report['settings'] = {'repeat':args.repeat,'limit':args.limit,'width':args.width,'maxDepth':args.max_depth,'maxFactNodes':args.max_fact_nodes,'topK':args.top_k,
+		'vectors':args.vectors,'gazetteer':args.gazetteer,'tripleStore':args.triple_store,'replay':args.replay,'replayLatency':args.replay_latency}
+	report['runs'] = len(records)
+	report['errors'] = len([record for record in records if 'error' in record])
+
+	# Latency of each phase over all the successful runs
+	phases = {}
+	for record in records:
+		for phase,seconds in record.get('timings',{}).items():
+			phases.setdefault(phase,[]).append(seconds)
+	report['phases'] = {phase:{'p50':percentile(values,50),'p95':percentile(values,95),'max':max(values)} for phase,values in phases.items()}
+
+	httpCalls = {}
+	for record in records:
+		for service,count in record['httpCalls'].items():
+			httpCalls[service] = httpCalls.get(service,0)+count
+	httpCalls['total'] = sum(httpCalls.values())
+	report['httpCalls'] = httpCalls
+
+	counters = {}
+	for record in records:
+		for counter,count in record.get('counters',{}).items():
+			counters[counter] = counters.get(counter,0)+count
+	report['counters'] = counters
+
+	# Recall of the last run of each query, queries without gold answers are left out
+	lastRecords = list({record['id']:record for record in records}.values())
+	recalls = [record['recall'] for record in lastRecords if record.get('recall') is not None]
+	report['recall'] = sum(recalls)/len(recalls) if recalls else None
+
+	report['queries'] = lastRecords
+	return report
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Latency benchmark over the QALD-5 training set')
+	parser.add_argument('dataset',nargs='?',default=os.path.join(os.path.dirname(os.path.abspath(__file__)),'saq-2015_training_set.xml'),help='QALD XML file')
+	parser.add_argument('--fixtures',default='benchmarkFixtures',help='Directory holding the recorded service responses, used instead of --sparql-cache and --similarity-store')
+	parser.add_argument('--output',default='benchmark.json',help='JSON file receiving the report')
+	parser.add_argument('--repeat',type=int,default=1,help='Number of times every query is run')
+	parser.add_argument('--limit',type=int,default=50,help='Number of fact nodes searched for the gold answers, and ranked unless --top-k is given')
+	graphSearch.addSearchArguments(parser)
+	args = parser.parse_args()
+
+	configureFixtures(args)
+	dataset = readDataset(args.dataset)
+
+	records = []
+	for run in range(args.repeat):
+		for queryId,sentence,goldAnswers in dataset:
+			records.append(runQuery(queryId,sentence,goldAnswers,args))
+
+	report = getReport(records,args)
+	with open(args.output,'w',encoding='utf-8') as output:
+		json.dump(report,output,indent=2)
+
+	# Summary
+	for phase,stats in report['phases'].items():
+		print(phase.ljust(8)+' p50 '+('%.3f' % stats['p50'])+'s  p95 '+('%.3f' % stats['p95'])+'s  max '+('%.3f' % stats['max'])+'s')
+	print('HTTP calls : '+str(report['httpCalls']))
+	print('Counters : '+str(report['counters']))
+	print('Recall : '+str(report['recall']))
+	print('Errors : '+str(report['errors'])+' of '+str(report['runs'])+' runs')
+	print('Report written to '+args.output)
+
+if __name__ == '__main__':
+	main()
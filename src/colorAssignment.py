@@ -1,49 +1,36 @@
-from ngramTree import *
-
-# This class is responsible for assignment of colors to the nodes in the ngram tree
+# This class is responsible for assignment of colors to the tokens of the query
+# The nodes of the n-gram tree are colored from the colors of the tokens while the tree is built (see NgramTree.constructTree)
 class ColorAssignment:
 
-	colorDictionary = {}	# This dictionary stores the individual tokens ['a', 'b', 'c', 'd'] and their color values
-
-	# lookuplist - [['a', 'b', 'c', 'd'], ['a b', 'b c', 'c d'], ['a b c', 'b c d'], ['a b c d']]
-	def assignInitialColors(self,rootNode,lookupList):
-			
-		if rootNode and len(lookupList)>=1:
-			oneGrams = lookupList[0]	# Gets the one grams		
-			
-			for index in range(len(oneGrams)):	
-				if(oneGrams[index] not in self.colorDictionary):
-					self.colorDictionary[oneGrams[index]] = index		# This assigns the color values to each token
-
-
-			stack = []
-			stack.append(rootNode)									# Using stack for DFS
-
-			while(stack):
-				currNode = stack.pop()
-
-				# Assign colors to this node based on the presence of tokens
-				if not currNode.isVisited:							# If a node repeats, do not initialize color again
-					
-					currNode.isVisited = True						
-
-					tokens = currNode.data.split(' ')				# Check for individual tokens
-					
-					for token in tokens:							
-						if(token in self.colorDictionary):
-							currNode.color.append(self.colorDictionary[token])	# Assign colors
-
-					for childNodes in currNode.children:			# Add children to the stack
-						stack.append(childNodes)
-		
+	def __init__(self,colorDictionary):
+		self.colorDictionary = colorDictionary		# This dictionary stores the individual tokens ['a', 'b', 'c', 'd'] of the query and their color values
 
-		#return rootNode	
+	# oneGrams - tokens of the query ['a', 'b', 'c', 'd']
+	# Returns the colors of the tokens, in the order of the query (bitmasks)
+	def assignInitialColors(self,oneGrams):
 
+		tokenColors = []
+		for index in range(len(oneGrams)):	
+			if(oneGrams[index] not in self.colorDictionary):
+				self.colorDictionary[oneGrams[index]] = index		# This assigns the color values to each token
 
+			tokenColors.append(getColorBit(self.colorDictionary[oneGrams[index]]))
 
+		return tokenColors
 
 
+# The colours covered by a node, a resource or a fact node are stored as a bitmask : bit i is set when
+# the keyword of colour i is covered. The union of two coverages is then a single or, and checking a
+# keyword a single and, whatever the number of keywords in the query.
 
-			
+# Returns the bit of a colour
+def getColorBit(color):
+	return 1<<color
 
+# Returns the number of colours covered
+def countColors(colors):
+	return bin(colors).count('1')
 
+# Returns the colours covered, in increasing order
+def getColorList(colors):
+	return [color for color in range(colors.bit_length()) if colors>>color & 1]
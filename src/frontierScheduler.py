@@ -0,0 +1,206 @@
+import queue
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Schedules the exploration of the search phase
+#
+# The search proceeds level by level. The pivot elements form the first level and the URI objects
+# of the fact nodes found at one level form the next one. All the resources of a level are explored
+# by a bounded pool of worker threads, so a level that fans out to 40 URIs costs roughly
+# 40/width round trips instead of 40.
+#
+# exploreResource yields the fact nodes of a resource a page at a time (see SparqlClient.getTripletPages).
+# Every worker hands its pages over to the search through a queue of its own, and each page is merged
+# as soon as it is its turn, the budget being checked after every page. The queues hold at most
+# pageQueueSize pages : a worker whose resource is not merged yet waits for room before fetching
+# more, so the level holds a few pages per worker whatever the size of the neighbourhoods.
+#
+# The fact nodes are merged in the order of the resources that produced them (and not in the order
+# the requests complete), which is the order the sequential search used to produce. The ranking
+# therefore stays stable whatever the timing of the endpoint.
+#
+# The search is bounded :
+#	- every URI is explored at most once (visited index)
+#	- levels deeper than maxDepth are not explored (the pivot elements are at depth 0)
+#	- no more than maxFactNodes fact nodes are collected : the pages of a level are merged as they
+#	  are fetched and, once the budget is spent, the resources that are not explored yet are cancelled
+#	  and the ones being explored stop after their current page. A level holds at most one resource
+#	  per fact node left in the budget, so a hub pivot cannot queue thousands of URIs that the budget
+#	  could not pay for anyway.
+# A bound set to None is disabled.
+#
+# The fact nodes are collected with the extend method of 'results', a list by default. A TopKRanking
+# (see topKRanking.py) ranks them as they are found instead, and only keeps the best ones. The
+# scheduler itself only holds the fact nodes of the current level.
+#
+# searchAsync runs the same search on an asyncio event loop, exploreResource is then an async generator
+# function and at most 'width' resources are explored at the same time.
+class FrontierScheduler:
+
+	pageQueueSize = 1							# Number of pages a worker fetches ahead of the merge
+
+	def __init__(self,exploreResource,width=8,maxDepth=2,maxFactNodes=5000):
+		self.exploreResource = exploreResource		# Function yielding the fact nodes having the resource as subject, a page (list) at a time
+		self.width = max(1,int(width))				# Number of resources explored concurrently
+		self.maxDepth = maxDepth					# Deepest level explored
+		self.maxFactNodes = maxFactNodes			# Maximum number of fact nodes collected
+		self.visited = set()						# URIs that were already explored
+		self.collected = 0							# Number of fact nodes collected
+
+	# Returns the pivot elements that form the first level
+	def getFirstFrontier(self,resourceList):
+		frontier = []
+		for resource in resourceList:
+			if(resource.uri not in self.visited):
+				self.visited.add(resource.uri)
+				frontier.append(resource)
+		return frontier
+
+	# Returns the resources of the next level
+	# The fact nodes are marked as explored, their objects are either in the next level or were already visited
+	def getNextFrontier(self,factNodes):
+		frontier = []
+		for factNode in factNodes:
+			if(factNode.isExplored == False and factNode.object.isUri):
+				factNode.isExplored = True
+				if(factNode.object.uri not in self.visited):
+					self.visited.add(factNode.object.uri)
+					frontier.append(factNode.object)
+		return frontier
+
+	# Adds a page of the fact nodes found for a resource of the level to the results, and the URIs of their objects to the next level
+	# Returns False once the budget is spent
+	def mergeFactNodes(self,results,factNodes,frontier,depth):
+		# Keep the first fact nodes if they exceed the budget
+		if(self.maxFactNodes is not None and self.collected+len(factNodes)>=self.maxFactNodes):
+			results.extend(factNodes[:self.maxFactNodes-self.collected])
+			self.collected = self.maxFactNodes
+			return False
+
+		results.extend(factNodes)
+		self.collected += len(factNodes)
+
+		if(self.maxDepth is None or depth<self.maxDepth):
+			frontier.extend(self.getNextFrontier(factNodes))
+		return True
+
+	# Returns the next level, cut to the number of fact nodes left in the budget
+	def cutFrontier(self,frontier):
+		if(self.maxFactNodes is not None):
+			return frontier[:self.maxFactNodes-self.collected]
+		return frontier
+
+	# Explores a resource on a worker thread and puts its pages on the queue, followed by None
+	# An exception is put on the queue instead, to be raised by the search. The exploration ends early once 'stop' is set
+	# (the search then empties the queue until the worker is done, so that a worker waiting for room is not left blocked)
+	def explorePages(self,resource,pages,stop):
+		try:
+			for factNodes in self.exploreResource(resource):
+				if stop.is_set():
+					return
+				pages.put(factNodes)
+			pages.put(None)
+		except Exception as e:
+			pages.put(e)
+
+	# Explores the graph starting from the pivot elements and returns the results holding all the fact nodes found
+	def search(self,resourceList,results=None):
+		if results is None:
+			results = []
+		frontier = self.getFirstFrontier(resourceList)
+
+		depth = 0
+		with ThreadPoolExecutor(max_workers=self.width) as executor:
+			while(frontier):
+				stop = threading.Event()
+				queues = [queue.Queue(FrontierScheduler.pageQueueSize) for resource in frontier]
+				futures = [executor.submit(self.explorePages,resource,pages,stop) for resource,pages in zip(frontier,queues)]
+				nextFrontier = []
+				try:
+					# The pages are merged in the order of the frontier
+					if not self.mergePages(results,queues,nextFrontier,depth):
+						nextFrontier = []
+				finally:
+					# The budget is spent (or the exploration failed), the resources not started yet are dropped
+					# and the ones being explored stop after their current page
+					stop.set()
+					for future in futures:
+						future.cancel()
+					for future,pages in zip(futures,queues):
+						while not future.done():
+							try:
+								pages.get(timeout=0.01)
+							except queue.Empty:
+								pass
+
+				frontier = self.cutFrontier(nextFrontier)
+				depth += 1
+
+		return results
+
+	# Merges the pages of the queues, one queue after the other, returns False once the budget is spent
+	def mergePages(self,results,queues,frontier,depth):
+		for pages in queues:
+			while True:
+				factNodes = pages.get()
+				if factNodes is None:
+					break
+				if isinstance(factNodes,Exception):
+					raise factNodes
+				if not self.mergeFactNodes(results,factNodes,frontier,depth):
+					return False
+		return True
+
+	# Same as search, for an async generator exploreResource
+	async def searchAsync(self,resourceList,results=None):
+		if results is None:
+			results = []
+		frontier = self.getFirstFrontier(resourceList)
+		semaphore = asyncio.Semaphore(self.width)
+
+		# A task keeps its place among the 'width' ones until its last page is taken, so that only these hold pages
+		# The tasks waiting for room in their queue are cancelled with the others once the search stops
+		async def explorePages(resource,pages):
+			async with semaphore:
+				try:
+					factNodePages = self.exploreResource(resource)
+					try:
+						async for factNodes in factNodePages:
+							await pages.put(factNodes)
+					finally:
+						await factNodePages.aclose()
+					await pages.put(None)
+				except Exception as e:
+					await pages.put(e)
+
+		depth = 0
+		while(frontier):
+			queues = [asyncio.Queue(FrontierScheduler.pageQueueSize) for resource in frontier]
+			tasks = [asyncio.ensure_future(explorePages(resource,pages)) for resource,pages in zip(frontier,queues)]
+			nextFrontier = []
+			try:
+				if not await self.mergePagesAsync(results,queues,nextFrontier,depth):
+					nextFrontier = []
+			finally:
+				for task in tasks:
+					task.cancel()
+				await asyncio.gather(*tasks,return_exceptions=True)
+
+			frontier = self.cutFrontier(nextFrontier)
+			depth += 1
+
+		return results
+
+	# Same as mergePages, for the asyncio queues
+	async def mergePagesAsync(self,results,queues,frontier,depth):
+		for pages in queues:
+			while True:
+				factNodes = await pages.get()
+				if factNodes is None:
+					break
+				if isinstance(factNodes,Exception):
+					raise factNodes
+				if not self.mergeFactNodes(results,factNodes,frontier,depth):
+					return False
+		return True
@@ -0,0 +1,293 @@
+import mmap
+import bisect
+import string
+import argparse
+from array import array
+from collections import deque
+from stringTable import StringTable, sortStrings, align, writePadding
+from tripleStore import readNTriples, getBinding
+from resourceGraph import Resource
+
+# Local pivot entity recognition : finds the DBPedia resources named in a query without calling spotlight
+#
+# The gazetteer is compiled once from the DBPedia dumps into a token-level Aho-Corasick automaton : the
+# names of the resources (labels and redirects) are sequences of tokens, and all the names occurring
+# in a query are found in a single pass over its tokens. The file is memory-mapped and read in place,
+# so worker processes opening the same gazetteer share its pages.
+#
+# The file is made of
+#	- the header : magic number, number of states, transitions, candidates and resources
+#	- the tokens of the names, in a StringTable : the automaton works on their numbers
+#	- the URIs and labels of the resources, in a StringTable
+#	- the resources : number of the URI, number of the label and support (unsigned 32 bit integers)
+#	- the states : first transition, failure link, output link, depth and first candidate of every state
+#	- the transitions : token and target, sorted by token within a state
+#	- the candidates : resources named by the state, by decreasing support
+# The state arrays hold one more entry than there are states, so that the transitions (candidates) of
+# state s are the ones from start[s] to start[s+1].
+#
+# The types dump only gives the most specific type of a resource (a politician is a dbo:Politician, not
+# a dbo:Person), so the types are either taken from instance_types_transitive, which lists all of
+# them, or closed over the subclasses of the DBPedia ontology given with --ontology.
+#
+# Usage : python3 gazetteer.py --labels labels_en.nt.gz --redirects redirects_en.nt.gz
+#                              --support page_links_en.nt.gz --types instance_types_transitive_en.nt.gz dbpedia.gazetteer
+#         python3 gazetteer.py ... --types instance_types_en.nt.gz --ontology dbpedia_2016-10.nt dbpedia.gazetteer
+class Gazetteer:
+
+	magic = b'GKGAZET1'
+
+	# Types of the resources kept when the types of the resources are given, the ones spotlight is restricted to
+	# Their subclasses are kept as well when the ontology is given
+	types = ['<http://dbpedia.org/ontology/Person>','<http://schema.org/Person>','<http://dbpedia.org/ontology/Company>',
+		'<http://dbpedia.org/ontology/Organisation>','<http://schema.org/Organization>','<http://dbpedia.org/ontology/AdministrativeRegion>',
+		'<http://dbpedia.org/ontology/PopulatedPlace>','<http://dbpedia.org/ontology/Place>','<http://schema.org/Place>']
+
+	def __init__(self,path):
+		self.path = path
+		self.file = open(path,'rb')
+		self.mmap = mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+		buffer = memoryview(self.mmap)
+
+		if(bytes(buffer[0:8])!=Gazetteer.magic):
+			raise ValueError(path + ' is not a gazetteer')
+
+		self.stateCount,self.transitionCount,self.candidateCount,self.resourceCount = buffer[8:40].cast('Q')
+		self.tokens = StringTable(buffer,40)						# Tokens of the names
+		self.strings = StringTable(buffer,self.tokens.end)			# URIs and labels of the resources
+
+		position = self.strings.end
+		self.views = []
+		self.resourceUris,position = self.getArray(buffer,position,self.resourceCount)
+		self.resourceLabels,position = self.getArray(buffer,position,self.resourceCount)
+		self.resourceSupports,position = self.getArray(buffer,position,self.resourceCount)
+		self.transitionStarts,position = self.getArray(buffer,position,self.stateCount+1)
+		self.failures,position = self.getArray(buffer,position,self.stateCount)
+		self.outputs,position = self.getArray(buffer,position,self.stateCount)
+		self.depths,position = self.getArray(buffer,position,self.stateCount)
+		self.candidateStarts,position = self.getArray(buffer,position,self.stateCount+1)
+		self.transitionTokens,position = self.getArray(buffer,position,self.transitionCount)
+		self.transitionTargets,position = self.getArray(buffer,position,self.transitionCount)
+		self.candidates,position = self.getArray(buffer,position,self.candidateCount)
+
+	# Returns the array of 'count' unsigned 32 bit integers at the position, and the position following it
+	def getArray(self,buffer,position,count):
+		view = buffer[position:position+4*count].cast('I')
+		self.views.append(view)
+		return view,align(position+4*count)
+
+	# Returns the state reached from 'state' with the token (number), -1 if there is no transition
+	def getTransition(self,state,token):
+		start,end = self.transitionStarts[state],self.transitionStarts[state+1]
+		index = bisect.bisect_left(self.transitionTokens,token,start,end)
+		if(index<end and self.transitionTokens[index]==token):
+			return self.transitionTargets[index]
+		return -1
+
+	# Returns the (start,end,state) of the names found in the tokens, the name covers the tokens start to end-1
+	# All the occurrences are returned, overlapping ones included
+	def findNames(self,tokens):
+		names = []
+		state = 0
+
+		for position,token in enumerate(tokens):
+			number = self.tokens.find(token)
+
+			# Follow the failure links until the token extends a name, back to the root otherwise
+			while True:
+				target = self.getTransition(state,number) if number>=0 else -1
+				if(target>=0):
+					state = target
+					break
+				if(state==0):
+					break
+				state = self.failures[state]
+
+			# The names ending here : the state itself and its output links
+			match = state if self.candidateStarts[state]<self.candidateStarts[state+1] else self.outputs[state]
+			while(match!=0):
+				names.append((position+1-self.depths[match],position+1,match))
+				match = self.outputs[match]
+
+		return names
+
+	# Returns the pivot elements of the query, sorted on their support
+	# As spotlight does, overlapping names are resolved in favour of the first and longest one
+	def getResources(self,query):
+		queryTokens = query.split()
+		names = self.findNames([normalizeToken(token) for token in queryTokens])
+		names.sort(key=lambda name: (name[0],name[0]-name[1]))
+
+		resourceList = []
+		end = 0
+		for name in names:
+			if(name[0]<end):
+				continue
+			end = name[1]
+
+			keyword = ' '.join(queryTokens[name[0]:name[1]])
+			state = name[2]
+			for i in range(self.candidateStarts[state],self.candidateStarts[state+1]):
+				resource = self.candidates[i]
+				pivotElement = Resource(self.strings.get(self.resourceUris[resource]),self.strings.get(self.resourceLabels[resource]),self.resourceSupports[resource],keyword)
+				pivotElement.isUri = True
+				resourceList.append(pivotElement)
+
+		resourceList.sort(key=lambda x: x.support, reverse=True)
+		return resourceList
+
+	def close(self):
+		for view in self.views:
+			view.release()
+		self.tokens.close()
+		self.strings.close()
+		self.mmap.close()
+		self.file.close()
+
+	# Compiles a gazetteer from the DBPedia dumps (N-Triples, optionally gzipped)
+	# labelsPath : rdfs:label of the resources
+	# redirectsPath : redirects, their names are names of the resources they redirect to
+	# supportPath : page links, the support of a resource is its number of incoming links
+	# typesPath : rdf:type of the resources, only the resources of Gazetteer.types are kept when it is given
+	# ontologyPath : DBPedia ontology, the resources of the subclasses of Gazetteer.types are kept as well
+	def build(outputPath,labelsPath,redirectsPath=None,supportPath=None,typesPath=None,ontologyPath=None):
+		labels = {}					# key:URI  value:label
+		for subject,predicate,object in readNTriples(labelsPath):
+			binding = getBinding(object)
+			if(binding['type']=='literal' and binding.get('xml:lang','en')=='en'):
+				labels.setdefault(subject,binding['value'])
+
+		redirects = {}				# key:URI of the redirect  value:URI of the resource
+		if redirectsPath:
+			for subject,predicate,object in readNTriples(redirectsPath):
+				redirects[subject] = object
+
+		support = {}				# key:URI  value:number of incoming links
+		if supportPath:
+			for subject,predicate,object in readNTriples(supportPath):
+				support[object] = support.get(object,0)+1
+
+		allowed = None				# URIs of the resources kept
+		if typesPath:
+			types = getSubclasses(Gazetteer.types,ontologyPath) if ontologyPath else set(Gazetteer.types)
+			allowed = set(subject for subject,predicate,object in readNTriples(typesPath) if object in types)
+
+		# The names of every resource : its label and the names of its redirects
+		names = {}					# key:tokens of a name  value:set of URIs
+		for uri in set(labels)|set(redirects):
+			resource = redirects.get(uri,uri)
+			if(allowed is not None and resource not in allowed):
+				continue
+			name = labels[uri] if uri in labels else getName(uri)
+			tokens = tuple(normalizeToken(token) for token in name.split())
+			if(tokens and all(tokens)):
+				names.setdefault(tokens,set()).add(resource)
+
+		# Trie of the names
+		children = [{}]				# key:token  value:state
+		depths = [0]
+		named = [None]				# URIs named by the state
+		for tokens,uris in names.items():
+			state = 0
+			for token in tokens:
+				if(token not in children[state]):
+					children[state][token] = len(children)
+					children.append({})
+					depths.append(depths[state]+1)
+					named.append(None)
+				state = children[state][token]
+			named[state] = uris
+
+		# Failure links (longest proper suffix that is a state) and output links (longest proper suffix naming resources), breadth first
+		failures = [0]*len(children)
+		outputs = [0]*len(children)
+		queue = deque(children[0].values())
+		while(queue):
+			state = queue.popleft()
+			for token,child in children[state].items():
+				failure = failures[state]
+				while(failure!=0 and token not in children[failure]):
+					failure = failures[failure]
+				if(token in children[failure]):
+					failure = children[failure][token]
+				failures[child] = failure
+				outputs[child] = failure if named[failure] is not None else outputs[failure]
+				queue.append(child)
+
+		# Number the tokens, strings and resources
+		tokenNumbers = {token:number for number,token in enumerate(sortStrings(set(token for tokens in names for token in tokens)))}
+		resources = sorted(set(uri for uris in names.values() for uri in uris))
+		resourceNumbers = {uri:number for number,uri in enumerate(resources)}
+		resourceLabels = [labels.get(uri) or getName(uri) for uri in resources]
+		strings = sortStrings(set(resources)|set(resourceLabels))
+		stringNumbers = {value:number for number,value in enumerate(strings)}
+
+		transitionStarts,transitionTokens,transitionTargets = array('I'),array('I'),array('I')
+		candidateStarts,candidates = array('I'),array('I')
+		for state in range(len(children)):
+			transitionStarts.append(len(transitionTokens))
+			for number,child in sorted((tokenNumbers[token],child) for token,child in children[state].items()):
+				transitionTokens.append(number)
+				transitionTargets.append(child)
+
+			candidateStarts.append(len(candidates))
+			if named[state] is not None:
+				for uri in sorted(named[state],key=lambda uri: (-support.get(uri,0),uri)):
+					candidates.append(resourceNumbers[uri])
+		transitionStarts.append(len(transitionTokens))
+		candidateStarts.append(len(candidates))
+
+		with open(outputPath,'wb') as output:
+			output.write(Gazetteer.magic)
+			output.write(array('Q',[len(children),len(transitionTokens),len(candidates),len(resources)]).tobytes())
+			StringTable.write(output,sortStrings(tokenNumbers))
+			StringTable.write(output,strings)
+			for values in (array('I',(stringNumbers[uri] for uri in resources)),array('I',(stringNumbers[label] for label in resourceLabels)),
+					array('I',(support.get(uri,0) for uri in resources)),transitionStarts,array('I',failures),array('I',outputs),
+					array('I',depths),candidateStarts,transitionTokens,transitionTargets,candidates):
+				output.write(values.tobytes())
+				writePadding(output)
+
+		return len(names),len(resources)
+
+
+# Returns the types and all their subclasses (rdfs:subClassOf and owl:equivalentClass) in the ontology
+def getSubclasses(types,ontologyPath):
+	subclasses = {}				# key:class  value:its direct subclasses and equivalent classes
+	for subject,predicate,object in readNTriples(ontologyPath):
+		if(predicate=='<http://www.w3.org/2000/01/rdf-schema#subClassOf>'):
+			subclasses.setdefault(object,[]).append(subject)
+		elif(predicate=='<http://www.w3.org/2002/07/owl#equivalentClass>'):
+			subclasses.setdefault(object,[]).append(subject)
+			subclasses.setdefault(subject,[]).append(object)
+
+	closed = set(types)
+	stack = list(types)
+	while(stack):
+		for subclass in subclasses.get(stack.pop(),[]):
+			if(subclass not in closed):
+				closed.add(subclass)
+				stack.append(subclass)
+	return closed
+
+# Returns the token as matched by the gazetteer : lower case, without the punctuation around it
+def normalizeToken(token):
+	return token.strip(string.punctuation).lower()
+
+# Returns the name of a resource from its URI, e.g. <http://dbpedia.org/resource/Barack_Obama> -> Barack Obama
+def getName(uri):
+	return uri.strip('<>').split('/')[-1].replace('_',' ')
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Compiles a gazetteer from the DBPedia dumps')
+	parser.add_argument('output',help='Gazetteer file')
+	parser.add_argument('--labels',required=True,help='N-Triples file of the labels of the resources')
+	parser.add_argument('--redirects',help='N-Triples file of the redirects')
+	parser.add_argument('--support',help='N-Triples file of the page links, counted as the support of the resources')
+	parser.add_argument('--types',help='N-Triples file of the types of the resources (instance_types_transitive), only persons, organisations and places are kept')
+	parser.add_argument('--ontology',help='N-Triples file of the DBPedia ontology, the subclasses of the kept types are kept as well (for a --types file that is not transitive)')
+	args = parser.parse_args()
+
+	nameCount,resourceCount = Gazetteer.build(args.output,args.labels,args.redirects,args.support,args.types,args.ontology)
+	print(str(nameCount)+' names of '+str(resourceCount)+' resources stored in '+args.output)
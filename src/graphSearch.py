@@ -1,10 +1,22 @@
-from ngramsEngine import ngramsEngine
 from ngramTree import *
 from pivotEntityRecognition import *
-from colorAssignment import ColorAssignment
+from colorAssignment import ColorAssignment, getColorList
 from sparqlClient import SparqlClient
+from sparqlCache import SparqlCache
+from tripleStore import TripleStore
+from gazetteer import Gazetteer
+from frontierScheduler import FrontierScheduler
+from topKRanking import TopKRanking, getRankingKey
+from searchContext import SearchContext
+from wordSimilarity import WordSimilarity
+from similarityStore import SimilarityStore
+from similarityClient import SimilarityClient
+from httpPool import HttpConnectionPool
+from transport import TransportArchive, RecordingTransport, ReplayTransport, AsyncRecordingTransport, AsyncReplayTransport
 import inflection
-import urllib.request
+import argparse
+import asyncio
+import json
 import sys
 
 class GraphSearch:
@@ -15,22 +27,12 @@ class GraphSearch:
 # Method that prints the initial color assigned
 def printColors(treeObj,rootNode):
 
-	# Reset the visited flag for the traversal 
-	treeObj.resetVisitedFlag(rootNode)
 	listNgrams = []
-	stack = []
-	stack.append(rootNode)
-
-	while(stack):
-		currNode = stack.pop()
-		if not currNode.isVisited:
-			currNode.isVisited = True	
-			#print('---------')
-			listNgrams.append(currNode.data)
-			#print(currNode.data)
-			#print(currNode.color)
-			for childNodes in currNode.children:
-				stack.append(childNodes)
+	for currNode in treeObj.getPreOrder(rootNode):
+		#print('---------')
+		listNgrams.append(currNode.data)
+		#print(currNode.data)
+		#print(getColorList(currNode.color))
 	return listNgrams
 
 # Print the Pivot entities recogised
@@ -44,7 +46,7 @@ def printpre(resourceList):
 			print("Label : "+res.label)
 			print("Incoming Links :  "+str(res.support))
 			print("keyword : "+res.keyword)
-			print("colors : "+str(res.colors))
+			print("colors : "+str(getColorList(res.colors)))
 			print('------------------------')
 
 # Print factnodes
@@ -53,7 +55,7 @@ def printTriplets(tripleList):
 		print('----')
 		obj = triple.object
 		print(str(obj.score))
-		print(str(obj.colors))
+		print(str(getColorList(obj.colors)))
 		print(str(obj.keyword))
 		print(str(triple.subject.uri) + ' ' + str(triple.predicate.uri) + ' ' + str(triple.object.uri))
 
@@ -81,111 +83,247 @@ def getBiGramList(sentence,resource):
 
 
 # Ranks the results coverage first followed by the scores
-def rankResults(listFactNodes,length):
-	# new list will contain lists of nodes with each list at index corresponding to the number of colors covered by the node
-	newList = []
-	
-	# initialize the list
-	for i in range(0,length):
-		newList.append([])
-
-	# insert the nodes at the appropriate index lists
-	for node in listFactNodes:
-		index = int(len(node.colors)-1)
-		newList[index].append(node)
-
-	# sort list on scores
-	for list in newList:
-		list.sort(key=lambda x: x.score, reverse=True)
+# Fact nodes with the same coverage and score keep the order they were found in
+def rankResults(listFactNodes):
+	return sorted(listFactNodes,key=getRankingKey,reverse=True)
+
+
+
+# Adds the options configuring the search to an argument parser
+def addSearchArguments(parser):
+	parser.add_argument('--sparql-cache',default='sparqlCache.db',help='SQLite file caching the SPARQL results, an empty value disables the cache')
+	parser.add_argument('--cache-ttl',type=int,default=86400,help='Number of seconds a cached SPARQL result stays valid')
+	parser.add_argument('--cache-size',type=int,default=10000,help='Maximum number of result pages (SparqlClient.pageSize triples of a neighbourhood) kept in the SPARQL cache')
+	parser.add_argument('--width',type=int,default=8,help='Number of resources explored concurrently during the search phase')
+	parser.add_argument('--max-depth',type=int,default=2,help='Deepest level of the graph explored from the pivot elements (the pivot elements are at depth 0)')
+	parser.add_argument('--max-fact-nodes',type=int,default=5000,help='Maximum number of fact nodes collected during the search phase')
+	parser.add_argument('--top-k',type=int,help='Only rank and keep the best k fact nodes')
+	parser.add_argument('--gazetteer',help='Local gazetteer (built with gazetteer.py) recognising the pivot entities instead of spotlight')
+	parser.add_argument('--triple-store',help='Local triple store (built with tripleStore.py) answering the lookups instead of the SPARQL endpoint')
+	parser.add_argument('--vectors',help='Word-vector model (text or .npy) used to score the predicates locally instead of calling EasyESA and Swoogle')
+	parser.add_argument('--similarity-store',default='similarityStore.db',help='SQLite file keeping the scores of the similarity services, an empty value disables it')
+	parser.add_argument('--record',metavar='ARCHIVE',help='Record the responses of the services to an archive (the SPARQL cache and the similarity store are not used)')
+	parser.add_argument('--replay',metavar='ARCHIVE',help='Answer the requests from an archive instead of the services (the SPARQL cache and the similarity store are not used)')
+	parser.add_argument('--replay-latency',type=parseLatency,default=0,help="Seconds waited before answering a replayed request, or 'recorded' for the time the request took when it was recorded")
+	parser.add_argument('--trace',action='store_true',help='Record the time spent in every phase and request and count the triples fetched, the predicates scored and the fact nodes created')
+
+# Parses the value of --replay-latency
+def parseLatency(value):
+	if(value=='recorded'):
+		return value
+	try:
+		return float(value)
+	except ValueError:
+		raise argparse.ArgumentTypeError("expected a number of seconds or 'recorded'")
+
+# Returns the transport asked for by the options, None for the live services
+def getTransport(args):
+	if(args.replay):
+		return ReplayTransport(TransportArchive(args.replay),args.replay_latency)
+	if(args.record):
+		return RecordingTransport(HttpConnectionPool(),TransportArchive(args.record))
+	return None
+
+# Same as getTransport for the asyncio search, returns the live AsyncHttpClient when there is nothing to record or replay
+def getAsyncTransport(args,maxConnections=100):
+	if(args.replay):
+		return AsyncReplayTransport(TransportArchive(args.replay),args.replay_latency)
+
+	from asyncHttp import AsyncHttpClient
+	http = AsyncHttpClient(maxConnections=maxConnections)
+	if(args.record):
+		return AsyncRecordingTransport(http,TransportArchive(args.record))
+	return http
+
+# Sets up the caches and the similarity backend from the parsed options
+def configureSearch(args):
+
+	SearchContext.instrument = args.trace
+
+	# Every request has to reach the transport to be recorded or replayed, the caches are left out
+	if(args.record or args.replay):
+		transport = getTransport(args)
+		PivotEntityRecognition.transport = transport
+		SparqlClient.transport = transport
+		WordSimilarity.client = SimilarityClient(transport=transport)
+	else:
+		# Reuse the neighbourhoods fetched by the previous queries
+		if(args.sparql_cache):
+			SparqlClient.cache = SparqlCache(args.sparql_cache,ttl=args.cache_ttl,maxEntries=args.cache_size)
 
-	# flatten the sorted list
-	returnList = []
-	for i in range(len(newList)-1,-1,-1):
-		for node in newList[i]:
-			returnList.append(node)
+		# Never ask the similarity services twice for the same pair
+		if(args.similarity_store):
+			WordSimilarity.client = SimilarityClient(store=SimilarityStore(args.similarity_store))
 
-	return returnList
+	if(args.gazetteer):
+		PivotEntityRecognition.gazetteer = Gazetteer(args.gazetteer)
 
+	if(args.triple_store):
+		SparqlClient.store = TripleStore(args.triple_store)
 
+	if(args.vectors):
+		WordSimilarity.loadVectorModel(args.vectors)
 
-# Driver method
-def main():
 
-	# Ask the user to input the query
-	sentence = input("Enter the query : ")
+# Phases 1 and 2 : builds the n-gram tree of the query and assigns the initial colors
+# The time spent in each phase is recorded in the search context
+def buildNgramTree(sentence,context,verbose=False):
 
-	print()
-	print()
-	print('Phase 1 ... N GRAM Generation')
-	# Generate the n-grams
-	ngramsEngineObj = ngramsEngine()
-	listNgrams,lookupList = ngramsEngineObj.generateNGrams(sentence)
+	if verbose:
+		print()
+		print()
+		print('Phase 1 ... N GRAM Generation')
+	with context.phase('ngrams'):
+		# The n-grams are the token spans of the n-gram tree, their strings are only joined when they are printed
+		tokens = sentence.split()
 
-	print('Generated N-grams')
+		if verbose:
+			print('Generated N-grams')
 
+			print()
+			print('Phase 2 ...  Color assignment')
+	with context.phase('colors'):
+		# Color assignment of the tokens
+		colorAssignmentObj = ColorAssignment(context.colorDictionary)
+		tokenColors = colorAssignmentObj.assignInitialColors(tokens)
 
-	# Start building the n-gram tree by selecting the root node 
-	rootWord = listNgrams[0]
-	rootNode = Node(rootWord)
+		# Start building the n-gram tree from the root node, the span of the whole query
+		rootNode = Node()
 
-	
-	# Construct the tree with the root node
-	treeObj = NgramTree(rootNode)
-	treeObj.constructTree(listNgrams,lookupList)
+		# Construct the tree with the root node, its nodes are colored from the colors of the tokens
+		treeObj = NgramTree(rootNode)
+		treeObj.constructTree(tokens,tokenColors)
 	
 	# Print tree 
 	#treeObj.printNode(rootNode)
-	print('N-gram tree constructed')
-
-	print()
-	print('Phase 2 ...  Color assignment')
-	
-	# Color assignment
-	colorAssignmentObj = ColorAssignment()
-	colorAssignmentObj.assignInitialColors(rootNode,lookupList)
-	
+	if verbose:
+		print('N-gram tree constructed')
 	
 	# Prints colours
 	#print(printColors(treeObj,rootNode))
-	print('Completed initial color assignment')
+	if verbose:
+		print('Completed initial color assignment')
 	#exit(3)
-	print()
-	print('Phase 3 ... PivotEntityRecognition')
-	# Make use of the spotlight to get the pivot entities sorted on the number of incoming links
-	spotlightObject = PivotEntityRecognition()
-	resourceList = spotlightObject.getPivotElement(sentence)
-	
 
-	#print PRE
-	printpre(resourceList)
-	print('Got the pivot element')
-	print()
+	return rootNode
 
-	
-	print('Phase 4 ... Search Phase')
-	print()
 
-	# get the initial fact nodes
-	listFactNodes = []
+# Runs the four phases of the search for a query
+# Returns the search context, which holds the pivot elements (resourceList), the ranked fact nodes (resultsList),
+# the time spent in each phase (timings, in seconds) and the spans and counters of the query when it is instrumented
+# With topK only the best topK fact nodes are kept, they are ranked while the graph is explored
+def search(sentence,width=8,maxDepth=2,maxFactNodes=5000,verbose=False,topK=None):
 
-	for resource in resourceList :
-		# Get the bi-gram list 
-		biGramList = getBiGramList(sentence,resource)
-		listFactNodes.extend(SparqlClient.getAllTripletsForPivotElement(resource,biGramList))
-	
-	
-	for factNode in listFactNodes:
-		if(factNode.isExplored == False and factNode.object.isUri):
-			biGramList = getBiGramList(sentence,factNode.object)
-			listFactNodes.extend(SparqlClient.getAllTripletsForPivotElement(factNode.object,biGramList))
-	
-	resultsList = rankResults(listFactNodes,len(sentence.split(' ')))
-	
-	printTriplets(resultsList)
+	# The similarity scores of the predicates are shared by all the pivot elements of the query
+	context = SearchContext(sentence)
 
-if __name__ == '__main__':
-	main()
+	with context.phase('total'):
+		buildNgramTree(sentence,context,verbose)
+
+		if verbose:
+			print()
+			print('Phase 3 ... PivotEntityRecognition')
+		with context.phase('pivots'):
+			# Make use of the spotlight (or the gazetteer) to get the pivot entities sorted on the number of incoming links
+			spotlightObject = PivotEntityRecognition()
+			with context.instrumentation.span(PivotEntityRecognition.getBackend(),sentence):
+				resourceList = spotlightObject.getPivotElement(sentence,context.colorDictionary)
+			context.resourceList = resourceList
+		
+
+		if verbose:
+			#print PRE
+			printpre(resourceList)
+			print('Got the pivot element')
+			print()
+
+			print('Phase 4 ... Search Phase')
+			print()
+
+		# Explore the graph from the pivot elements, a level of the search at a time
+		# The fact nodes of a resource reach the scheduler a page at a time
+		def exploreResource(resource):
+			# Get the bi-gram list 
+			biGramList = getBiGramList(sentence,resource)
+			return SparqlClient.getTripletPages(resource,biGramList,context)
 
+		with context.phase('search'):
+			scheduler = FrontierScheduler(exploreResource,width=width,maxDepth=maxDepth,maxFactNodes=maxFactNodes)
+			results = scheduler.search(resourceList,TopKRanking(topK) if topK is not None else [])
+		
+		with context.phase('ranking'):
+			context.resultsList = results.getResults() if topK is not None else rankResults(results)
+			context.factNodeCount = scheduler.collected
 
+	return context
 
 
+# Same as search, but all the requests of the query go through the asyncio client 'http' (see asyncHttp.py)
+# Several queries can be searched concurrently on the same event loop
+async def searchAsync(sentence,http,width=8,maxDepth=2,maxFactNodes=5000,verbose=False,topK=None):
+
+	context = SearchContext(sentence)
+
+	with context.phase('total'):
+		buildNgramTree(sentence,context,verbose)
+
+		if verbose:
+			print()
+			print('Phase 3 ... PivotEntityRecognition')
+		with context.phase('pivots'):
+			spotlightObject = PivotEntityRecognition()
+			with context.instrumentation.span(PivotEntityRecognition.getBackend(),sentence):
+				resourceList = await spotlightObject.getPivotElementAsync(sentence,context.colorDictionary,http)
+			context.resourceList = resourceList
+
+		if verbose:
+			printpre(resourceList)
+			print('Got the pivot element')
+			print()
+
+			print('Phase 4 ... Search Phase')
+			print()
+
+		def exploreResource(resource):
+			biGramList = getBiGramList(sentence,resource)
+			return SparqlClient.getTripletPagesAsync(resource,biGramList,context,http)
+
+		with context.phase('search'):
+			scheduler = FrontierScheduler(exploreResource,width=width,maxDepth=maxDepth,maxFactNodes=maxFactNodes)
+			results = await scheduler.searchAsync(resourceList,TopKRanking(topK) if topK is not None else [])
+
+		with context.phase('ranking'):
+			context.resultsList = results.getResults() if topK is not None else rankResults(results)
+			context.factNodeCount = scheduler.collected
+
+	return context
+
+
+# Driver method
+def main():
+
+	parser = argparse.ArgumentParser(description='Keyword search over DBPedia')
+	addSearchArguments(parser)
+	parser.add_argument('--async',dest='useAsync',action='store_true',help='Perform the requests with asyncio instead of worker threads')
+	args = parser.parse_args()
+	configureSearch(args)
+
+	# Ask the user to input the query
+	sentence = input("Enter the query : ")
+
+	if args.useAsync:
+		async def searchWithClient():
+			async with getAsyncTransport(args,maxConnections=args.width) as http:
+				return await searchAsync(sentence,http,width=args.width,maxDepth=args.max_depth,maxFactNodes=args.max_fact_nodes,verbose=True,topK=args.top_k)
+		context = asyncio.run(searchWithClient())
+	else:
+		context = search(sentence,width=args.width,maxDepth=args.max_depth,maxFactNodes=args.max_fact_nodes,verbose=True,topK=args.top_k)
+	
+	printTriplets(context.resultsList)
+
+	# One JSON record for the query, on stderr so that it is not mixed with the results
+	if args.trace:
+		print(json.dumps({'query':sentence,'timings':context.timings,'trace':context.instrumentation.toDict()}),file=sys.stderr)
+
+if __name__ == '__main__':
+	main()
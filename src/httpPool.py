@@ -0,0 +1,76 @@
+import http.client
+import threading
+from urllib.parse import urlsplit
+
+# Pool of keep-alive HTTP connections
+#
+# The connections are grouped by (scheme, host, port). A request takes an idle connection of its
+# host, or opens a new one, and gives it back once the response is read, so consecutive requests
+# to the same service reuse the same TCP connection. The pool can be used from several threads.
+class HttpConnectionPool:
+
+	def __init__(self,maxConnections=8,timeout=10):
+		self.maxConnections = maxConnections				# Number of idle connections kept per host
+		self.timeout = timeout								# Socket timeout (seconds)
+		self.idle = {}										# key:(scheme,host,port)  value:list of idle connections
+		self.lock = threading.Lock()
+
+	# Returns a connection to the host and a boolean telling if it was reused
+	def getConnection(self,key):
+		with self.lock:
+			connections = self.idle.get(key)
+			if connections:
+				return connections.pop(),True
+
+		scheme,host,port = key
+		if(scheme=='https'):
+			return http.client.HTTPSConnection(host,port,timeout=self.timeout),False
+		return http.client.HTTPConnection(host,port,timeout=self.timeout),False
+
+	# Gives back a connection whose response was fully read
+	def releaseConnection(self,key,connection):
+		with self.lock:
+			connections = self.idle.setdefault(key,[])
+			if(len(connections)<self.maxConnections):
+				connections.append(connection)
+				return
+		connection.close()
+
+	# Performs a GET request and returns the body of the response
+	# Raises an IOError if the request fails or the status is not 2xx
+	def get(self,url,headers=None):
+		parts = urlsplit(url)
+		key = (parts.scheme,parts.hostname,parts.port)
+		path = parts.path or '/'
+		if parts.query:
+			path = path + '?' + parts.query
+
+		while True:
+			connection,isReused = self.getConnection(key)
+			try:
+				connection.request('GET',path,headers=headers or {})
+				response = connection.getresponse()
+				body = response.read()
+			except (http.client.HTTPException,OSError) as e:
+				connection.close()
+				# The server may have closed an idle connection, try again with a new one
+				if isReused:
+					continue
+				raise IOError(str(e))
+
+			if response.will_close:
+				connection.close()
+			else:
+				self.releaseConnection(key,connection)
+
+			if(response.status<200 or response.status>=300):
+				raise IOError(url + ' returned HTTP ' + str(response.status))
+			return body
+
+	# Closes the idle connections
+	def close(self):
+		with self.lock:
+			for connections in self.idle.values():
+				for connection in connections:
+					connection.close()
+			self.idle.clear()
@@ -0,0 +1,80 @@
+import time
+import threading
+import contextlib
+
+# Instrumentation of a keyword query
+#
+# Spans measure (monotonic clock) the time spent in a part of the search : a phase, or a request to
+# Spotlight, the SPARQL endpoint or the similarity services. Counters count the work done : triples
+# fetched, predicates scored, fact nodes created. Both are reported as a single record per query.
+#
+# When the instrumentation is disabled the search uses noInstrumentation, whose methods do nothing
+# and whose spans are a shared null context manager, so no clock is read and nothing is allocated.
+# The detail of a span is given as parts, joined by toDict only, so that a disabled span does not
+# build its string either.
+class Instrumentation:
+
+	def __init__(self):
+		self.origin = time.monotonic()				# Start of the query, the spans start relative to it
+		self.spans = []								# (name,detail parts,start,seconds)
+		self.counters = {}							# key:counter  value:count
+		self.lock = threading.Lock()
+
+	# Returns a context manager measuring a span, its detail is made of the parts separated by spaces
+	def span(self,name,*detail):
+		return Span(self,name,detail)
+
+	def addSpan(self,name,detail,start,end):
+		with self.lock:
+			self.spans.append((name,detail,start-self.origin,end-start))
+
+	def count(self,name,value=1):
+		with self.lock:
+			self.counters[name] = self.counters.get(name,0)+value
+
+	# Returns the record of the query as a dictionary that can be serialized to JSON
+	def toDict(self):
+		with self.lock:
+			spans = [{'name':name,'detail':' '.join(str(part) for part in detail) if detail else None,'start':start,'seconds':seconds} for name,detail,start,seconds in self.spans]
+			return {'spans':spans,'counters':dict(self.counters)}
+
+
+# A measured part of the search, used as a context manager
+# When 'timings' is given, the duration is also stored in it under the name of the span
+class Span:
+
+	def __init__(self,instrumentation,name,detail=None,timings=None):
+		self.instrumentation = instrumentation
+		self.name = name
+		self.detail = detail						# Parts of what the span is about, e.g. the URI of the pivot element and the offset
+		self.timings = timings
+
+	def __enter__(self):
+		self.start = time.monotonic()
+		return self
+
+	def __exit__(self,excType,excValue,traceback):
+		end = time.monotonic()
+		self.instrumentation.addSpan(self.name,self.detail,self.start,end)
+		if self.timings is not None:
+			self.timings[self.name] = end-self.start
+
+
+# Disabled instrumentation
+class NoInstrumentation:
+
+	def span(self,name,*detail):
+		return noSpan
+
+	def addSpan(self,name,detail,start,end):
+		pass
+
+	def count(self,name,value=1):
+		pass
+
+	def toDict(self):
+		return None
+
+
+noSpan = contextlib.nullcontext()
+noInstrumentation = NoInstrumentation()
@@ -1,16 +1,42 @@
-from ngramsEngine import ngramsEngine
+import threading
 
 # This class represents Node of the tree
 # A Node has value/data and also has links to its children stored as a list
+# A node of a lattice (see NgramTree.constructTree) only holds its token span : its data (the n-gram)
+# is joined from the tokens and its children are taken from the lattice when they are asked for.
 class Node(object):
+    __slots__ = ('text','tree','color','childNodes','isDuplicate','number','start','end')
 
-    def __init__(self, data):
-        self.data = data 			# Data in the node
-        self.color = []				# Colour assignment for the node
-        self.children = []			# Represents the child nodes
+    def __init__(self, data=None, start=0, end=0, tree=None):
+        self.text = data			# Data in the node, None when it is taken from the tokens of the tree
+        self.tree = tree			# Lattice holding the node, None for a standalone node
+        self.color = 0				# Colours covered by the node (bitmask, see colorAssignment.py)
+        self.childNodes = None		# Represents the child nodes, None until they are asked for
         self.isDuplicate = False	# Checks if this node is the child of 2 different nodes
-        self.isVisited = False		# This flag helps is traversal
-
+        self.number = 0				# Number of the node in its tree, indexes the visit marks of the traversals
+        self.start = start			# Token span covered by the node : tokens start to end-1 of the query
+        self.end = end
+
+    # Data in the node : the n-gram of its token span
+    @property
+    def data(self):
+        if self.text is not None or self.tree is None:
+            return self.text
+        return ' '.join(self.tree.tokens[self.start:self.end])
+
+    # Child nodes : the nodes of the spans (start,end-1) and (start+1,end) in a lattice
+    @property
+    def children(self):
+        if self.childNodes is None:
+            if self.tree is not None and self.end-self.start>1:
+                self.childNodes = [self.tree.getNode(self.start,self.end-1),self.tree.getNode(self.start+1,self.end)]
+            else:
+                self.childNodes = []
+        return self.childNodes
+
+    @children.setter
+    def children(self, children):
+        self.childNodes = children
 
     #Used to add child node to current node    
     def add_child(self, obj):
@@ -22,99 +48,143 @@ class NgramTree(object):
 
 	def __init__(self,rootNode):
 		self.rootNode = rootNode
+		self.tokens = []			# Tokens of the query
+		self.tokenColors = []		# Colors of the tokens (bitmasks)
+		self.lattice = []			# Nodes of the tree by length and start of their token span (see constructTree)
+		self.nodeCount = 1			# Number of nodes, numbered from 0
+		self.marks = threading.local()	# Visit marks of the traversals, each thread has its own (see startTraversal)
+
+	# Starts a traversal in the current thread, returns its epoch and the visit marks of the nodes
+	# A node is visited by the traversal once its mark is the epoch of the traversal : a new traversal
+	# only takes the next epoch instead of resetting every node, and threads traversing the same tree
+	# do not see each other's marks.
+	def startTraversal(self):
+		marks = self.marks
+		if(getattr(marks,'visits',None) is None or len(marks.visits)!=self.nodeCount):
+			marks.visits = [0]*self.nodeCount
+			marks.epoch = 0
+		marks.epoch += 1
+		return marks.epoch,marks.visits
+
+	# Returns the nodes below 'node' (the root by default) in pre order, each node once (DFS)
+	def getPreOrder(self,node=None):
+		epoch,visits = self.startTraversal()
+		nodes = []
+		stack = [node if node is not None else self.rootNode]
+
+		while(stack):
+			currNode = stack.pop()
+			if(visits[currNode.number]!=epoch):
+				visits[currNode.number] = epoch
+				nodes.append(currNode)
+				stack.extend(reversed(currNode.children))		# The first child is visited first
+
+		return nodes
+
+	# Returns the nodes below 'node' (the root by default) in post order, each node once (DFS)
+	def getPostOrder(self,node=None):
+		epoch,visits = self.startTraversal()
+		nodes = []
+		stack = [(node if node is not None else self.rootNode,False)]
+
+		while(stack):
+			currNode,isExpanded = stack.pop()
+			if isExpanded:
+				# All the nodes below it are in the list
+				nodes.append(currNode)
+			elif(visits[currNode.number]!=epoch):
+				visits[currNode.number] = epoch
+				stack.append((currNode,True))
+				for child in reversed(currNode.children):
+					stack.append((child,False))
+
+		return nodes
 
-	# Reset the visited flag to False
-	def resetVisitedFlag(self,node):
-		for n in node.children:
-			self.resetVisitedFlag(n)
-		node.isVisited = False
-		
 	# Post order traversal of the tree (DFS)
 	def post_order(self,node):
-		for n in node.children:
-			self.post_order(n)
-
-		if not node.isVisited:
-			node.isVisited = True
-			print(node.data)
-
+		for n in self.getPostOrder(node):
+			print(n.data)
 
-	# BFS traversal
+	# Pre order traversal of the tree
 	def printNode(self,node):
 		if node is None:
 			return
-		if not node.isVisited:
-			node.isVisited = True
-			print(node.data)
-
-		for c in node.children:
-			self.printNode(c)
-
-
-
-	# This module builds the n-gram tree with the basic idea of BFS traversal
-	# Input : List1, List2
-	# List1 : ['a b c d', 'a b c', 'b c d', 'a b', 'b c', 'c d', 'a', 'b', 'c', 'd']
-	# List2 : [['a', 'b', 'c', 'd'], ['a b', 'b c', 'c d'], ['a b c', 'b c d'], ['a b c d']]
-	# Algorithm :
-	# while(queue):
-	#	CurrentNode = queue.pop()
-	#	search for tokens that have a length = length(CurrentNode.value) - 1 
-	#	##[Get this from List2]
-	#	##[These tokens will be the nodes at the next level in the tree]
-	#	check if the tokens are already in the tree
-	#	if not create new node with these tokens 
-	#	add the token nodes as the children of CurrentNode
-
-	def constructTree(self,listNgrams,lookupList):
-
-		# This dictionary is used to track the nodes that are in the tree
-		# key:Nodevalue  value:Node
-		treeDictionary = {}
-
-		nodeQueue = []											# This list exhibits behaviour of a Queue
-		nodeQueue.append(self.rootNode)							# Add the root node to the Queue to begin search
-		treeDictionary[self.rootNode.data] = self.rootNode		# Add the root to the treeDictionary as it is seen
+		for n in self.getPreOrder(node):
+			print(n.data)
+
+
+
+	# This module builds the n-gram tree as a lattice of token spans
+	# Input : tokens of the query, ['a', 'b', 'c', 'd']
+	# The nodes of length n are in the order of the query, so the one at index i covers the token
+	# span (i,i+n). The children of the node of span (start,end) are the nodes of the spans (start,end-1)
+	# and (start+1,end), found by index in the lattice instead of searching the (n-1)-grams :
+	#
+	#	'a b c d' -> 'a b c', 'b c d'
+	#	'a b c'   -> 'a b', 'b c'			'b c d' -> 'b c', 'c d'
+	#	...
+	#
+	# A node is the child of 2 nodes (isDuplicate) unless its span starts or ends the query.
+	# The root node is the node of the whole query.
+	#
+	# Only the root is built here : the other nodes are created by getNode the first time they are
+	# reached (a traversal, or a lookup of a span), so a long query does not pay for the n*(n+1)/2
+	# nodes of its lattice unless they are used. The colors of a span are the colors of its tokens,
+	# color(start,end) = color(start,end-1) | tokenColors[end-1], the color of its left child and of its last token.
+	# tokenColors : colors of the tokens as bitmasks (see ColorAssignment), the nodes are left uncolored without them
+
+	def constructTree(self,tokens,tokenColors=None):
+
+		tokenCount = len(tokens)
+		self.tokens = tokens
+		self.tokenColors = tokenColors if tokenColors is not None else [0]*tokenCount
+
+		# lattice[n-1][start] is the node of the span (start,start+n), None until it is created
+		self.lattice = [[None]*(tokenCount-n+1) for n in range(1,tokenCount)]
+
+		self.rootNode.tree = self
+		self.rootNode.start = 0
+		self.rootNode.end = tokenCount
+		self.rootNode.childNodes = None
+		self.rootNode.color = 0
+		for color in self.tokenColors:
+			self.rootNode.color |= color
+		self.rootNode.number = tokenCount*(tokenCount+1)//2-1 if tokenCount>0 else 0
+		self.lattice.append([self.rootNode])
+
+		# Number of the nodes for the traversals, in the order of the lattice (by length, then start)
+		self.nodeCount = self.rootNode.number+1
 
+		#self.printNode(self.rootNode)
+		#self.post_order(self.rootNode)
 
-		while(nodeQueue):
-			currentNode = nodeQueue.pop(0)						# Pop the queue
-			data = currentNode.data 							# Get the data of the node
-
-			dataLen = len(data.split(' '))						# Get the length of the n-grams in the current token
-
-			if(dataLen-2 >= 0):									# Stop if we have reached situation where current iteration is for individual tokens
-				listChildren = lookupList[dataLen-2]			# Get the tokens that have a lenghth 1 less than that of the current token from the look up list
-
-				for child in listChildren:						
-					if child in data:							# Check if the child is a sustring of the token
-
-						if child not in treeDictionary:			# Check if a node for 'child' is already created. If so retrieve that node and set it as a duplicate
-							newNode = Node(child)
-							nodeQueue.append(newNode)
-							treeDictionary[child] = newNode
-						else:
-							newNode = treeDictionary[child]
-							newNode.isDuplicate = True
+	# Returns the node of the token span (start,end), created the first time it is asked for
+	# Threads creating the same node at the same time create equivalent nodes (same span and number)
+	def getNode(self,start,end):
+		n = end-start
+		node = self.lattice[n-1][start]
+		if node is None:
+			tokenCount = len(self.tokens)
+			node = Node(None,start,end,self)
+			node.isDuplicate = 0<start and end<tokenCount
+			node.number = (n-1)*(tokenCount+1)-(n-1)*n//2+start
 
-						currentNode.add_child(newNode)			# Add this child to the parent node
-		
-		# Reset the visited flag for the traversal 
-		self.resetVisitedFlag(self.rootNode)
+			left = self.lattice[n-2][start] if n>1 else None
+			if left is not None:
+				node.color = left.color | self.tokenColors[end-1]
+			else:
+				for color in self.tokenColors[start:end]:
+					node.color |= color
 
-		#self.printNode(self.rootNode)
-		#self.post_order(self.rootNode)
+			self.lattice[n-1][start] = node
+		return node
 
 
 def main(query):
-	ngramsEngineObj = ngramsEngine()
-	listNgrams,lookupList = ngramsEngineObj.generateNGrams(query)
-
-	rootWord = listNgrams[0]
-	rootNode = Node(rootWord)
+	rootNode = Node()
 
 	treeObj = NgramTree(rootNode)
-	treeObj.constructTree(listNgrams,lookupList)
+	treeObj.constructTree(query.split())
 
 
 
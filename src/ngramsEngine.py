@@ -1,6 +1,7 @@
-from nltk.util import ngrams
-
-# This class makes use of nltk library for generating n-grams given a query
+# This class generates the n-grams of a query
+# The n-grams are generated lazily from the tokens of the query (iterNGrams), only the n-grams that
+# can exist are generated : n goes from the number of tokens down to 1.
+# The search does not use them : its n-gram tree works on the token spans (see NgramTree.constructTree).
 class ngramsEngine(object):
 
 	def __init__(self):
@@ -11,6 +12,16 @@ class ngramsEngine(object):
 		for token in ngramsList:
 			print(token.strip())
 
+	# Yields the (start,end,n-gram) of the tokens, longest first and in the order of the query for a given length
+	# The n-gram covers the tokens start to end-1
+	# EX:  i/p - ['a', 'b', 'c'] - (0,3,'a b c'), (0,2,'a b'), (1,3,'b c'), (0,1,'a'), (1,2,'b'), (2,3,'c')
+	def iterNGrams(self,tokens):
+		tokenCount = len(tokens)
+
+		for n in range(tokenCount,0,-1):
+			for start in range(tokenCount-n+1):
+				yield start,start+n,' '.join(tokens[start:start+n])
+
 
 	# Module that generates n-grams list
 	# Input : query
@@ -23,41 +34,21 @@ class ngramsEngine(object):
 	# EX:  i/p - a b c d 
 	# List1 : ['a b c d', 'a b c', 'b c d', 'a b', 'b c', 'c d', 'a', 'b', 'c', 'd']
 	# List2 : [['a', 'b', 'c', 'd'], ['a b', 'b c', 'c d'], ['a b c', 'b c d'], ['a b c d']]
+	# All the lengths are generated : the n-gram tree (see ngramTree.constructTree) needs one level per token
 
 	def generateNGrams(self,query):
 
-		# This stores the n-grams as generated by NLTK
-		ngramsNLTKList = []
-		
-		# Get the inital n-gram list built
-		for n in range(len(query),0,-1):
-			ngramsNLTKList.extend(ngrams(query.split(),n))
+		tokens = query.split()
 
 		# Actual n-gram list (List 1 as in the description)
 		ngramList = []
 
-		# A look up list (List 2 as in the description)
-		lookupList = []
-		
-		# Join the individual lists to get the n-grams
-		for ngram in ngramsNLTKList:
-			ngramList.append((' '.join(ngram)).strip())
-
-		# Determine the length of the lookupList required
-		if(len(ngramsNLTKList)>0):
-			maxLength = len(ngramsNLTKList[0])
-			for i in range(maxLength):
-				lookupList.append([])
-
-		# Fill in the lookupList
-		# All n-grams of length 1 goes in index 0
-		# All n-grams of length 2 goes in index 1
-		# All n-grams of length 3 goes in index 2 ...
-		for token in ngramsNLTKList:
-			joinedToken = ' '.join(token).strip()
-			listLength = len(joinedToken)
-			currentList = lookupList[len(token)-1]
-			currentList.append(' '.join(token))
+		# A look up list (List 2 as in the description), one list per length of n-gram
+		lookupList = [[] for n in range(len(tokens))]
+
+		for start,end,ngram in self.iterNGrams(tokens):
+			ngramList.append(ngram)
+			lookupList[end-start-1].append(ngram)
 
 		return ngramList,lookupList
 
@@ -1,11 +1,17 @@
-import urllib.request
 import sys
 import json
+import asyncio
+from httpPool import HttpConnectionPool
 from resourceGraph import Resource
-from colorAssignment import ColorAssignment
+from colorAssignment import getColorBit
 
 # Spotlight service for pivot entity recognition
 class PivotEntityRecognition:
+
+	endpoint = "http://spotlight.dbpedia.org/rest/candidates"		# Spotlight service
+	cache = None													# Optional SparqlCache keeping the spotlight responses, keyed by sentence
+	transport = HttpConnectionPool()								# Transport performing the requests (see transport.py)
+	gazetteer = None												# Optional local Gazetteer recognising the pivot entities instead of spotlight (see gazetteer.py)
 	
 	def __init__(self):
 		sentence = ''
@@ -15,8 +21,8 @@ class PivotEntityRecognition:
 		for res in resourceList:
 			tokens = res.keyword.split(' ')
 			for token in tokens:
-				if(token in ColorAssignment.colorDictionary):
-					res.colors.append(int(ColorAssignment.colorDictionary[token]))
+				if(token in self.colorDictionary):
+					res.colors |= getColorBit(self.colorDictionary[token])
 
 		return resourceList
 
@@ -73,13 +79,13 @@ class PivotEntityRecognition:
 				#If there is only one pivot identified for the query
 				pivotElement = self.getPivotObject(pivotTerms['resource'])
 				if(pivotElement is not None):
-					pivotElement.keyword = pivotTerms['@name']
+					pivotElement.keyword = Resource.share(pivotTerms['@name'])
 					resourceList.append(pivotElement)
 			else:
 				for resource in pivotTerms['resource']:
 					pivotElement = self.getPivotObject(resource)
 					if(pivotElement is not None):
-						pivotElement.keyword = pivotTerms['@name']
+						pivotElement.keyword = Resource.share(pivotTerms['@name'])
 						resourceList.append(pivotElement)
 
 		# This happens when the return type has multiple entity keywords
@@ -96,13 +102,13 @@ class PivotEntityRecognition:
 						#If there is only one pivot identified for the query
 						pivotElement = self.getPivotObject(resources['resource'])
 						if(pivotElement is not None):
-							pivotElement.keyword = resources['@name']
+							pivotElement.keyword = Resource.share(resources['@name'])
 							resourceList.append(pivotElement)
 					else:
 						for resource in resources['resource']:
 							pivotElement = self.getPivotObject(resource)
 							if(pivotElement is not None):
-								pivotElement.keyword = resources['@name']
+								pivotElement.keyword = Resource.share(resources['@name'])
 								resourceList.append(pivotElement)	
 
 		# Sort the resource list on the number of incoming links
@@ -112,38 +118,81 @@ class PivotEntityRecognition:
 
 		return resourceList
 
-	# Queries DBPedia spotlight to get the values
-	def requestSpotlight(self):
+	# Returns the URL of the spotlight request for the sentence
+	def getSpotlightUrl(self):
 		#encode spaces
 		sentence = self.sentence.replace(' ','%20')
 
 		#restrict types to person,organistion and location
 		urlTypes = 'types=DBpedia:Person,Schema:Person,DBpedia:Company,DBpedia:Organisation,Schema:Organization,DBpedia:AdministrativeRegion,DBpedia:PopulatedPlace,DBpedia:Place,Schema:Place'
-		url = "http://spotlight.dbpedia.org/rest/candidates?types="+urlTypes+"&text="+sentence
+		return PivotEntityRecognition.endpoint+"?types="+urlTypes+"&text="+sentence
+
+	# Returns the cached spotlight response for the sentence, None if there is none
+	def getCachedResponse(self):
+		if PivotEntityRecognition.cache is None:
+			return None
+		return PivotEntityRecognition.cache.get(PivotEntityRecognition.endpoint,self.sentence)
+
+	def cacheResponse(self,jsonStr):
+		if PivotEntityRecognition.cache is not None:
+			PivotEntityRecognition.cache.put(PivotEntityRecognition.endpoint,self.sentence,jsonStr)
+
+	# Queries DBPedia spotlight to get the values
+	def requestSpotlight(self):
+		jsonStr = self.getCachedResponse()
+		if jsonStr is not None:
+			return(self.parseJson(jsonStr))
+
+		url = self.getSpotlightUrl()
 		
-		request = urllib.request.Request(url)
-		request.add_header('Accept', 'application/json')
-		response = urllib.request.urlopen(request)
-		responseStr = str(response.read().decode('utf-8'))
+		responseStr = PivotEntityRecognition.transport.get(url,{'Accept':'application/json'}).decode('utf-8')
 
 		# fetch json from the response
 		jsonStr = json.loads(responseStr)
+		self.cacheResponse(jsonStr)
 
 		#Parse json
 		return(self.parseJson(jsonStr))
 
+	# Same as requestSpotlight, through the asyncio client 'http'
+	# The cache is read and written on a worker thread so that the event loop never waits for the disk
+	async def requestSpotlightAsync(self,http):
+		loop = asyncio.get_running_loop()
+		jsonStr = await loop.run_in_executor(None,self.getCachedResponse)
+		if jsonStr is None:
+			responseStr = (await http.get(self.getSpotlightUrl(),{'Accept':'application/json'})).decode('utf-8')
+			jsonStr = json.loads(responseStr)
+			await loop.run_in_executor(None,self.cacheResponse,jsonStr)
+		return(self.parseJson(jsonStr))
+
+	# Returns the name of the backend recognising the pivot entities, 'gazetteer' or 'spotlight'
+	def getBackend():
+		return 'gazetteer' if PivotEntityRecognition.gazetteer is not None else 'spotlight'
+
 	# Entry point of the class
-	def getPivotElement(self,query):
+	# colorDictionary : colors of the tokens of the query (see ColorAssignment)
+	def getPivotElement(self,query,colorDictionary):
 
 		self.sentence = query
+		self.colorDictionary = colorDictionary
+		if PivotEntityRecognition.gazetteer is not None:
+			return(self.updateColors(PivotEntityRecognition.gazetteer.getResources(query)))
 		#Make request
 		return(self.requestSpotlight())
+
+	# Entry point of the class for asyncio callers
+	async def getPivotElementAsync(self,query,colorDictionary,http):
+		self.sentence = query
+		self.colorDictionary = colorDictionary
+		if PivotEntityRecognition.gazetteer is not None:
+			return(self.updateColors(PivotEntityRecognition.gazetteer.getResources(query)))
+		return(await self.requestSpotlightAsync(http))
 	
 	
 if __name__ == '__main__':
 	spotlightObj = PivotEntityRecognition()
 	sentence = input(" Enter the keyword query : ")
-	resourceList = spotlightObj.getPivotElement(sentence)
+	resourceList = spotlightObj.getPivotElement(sentence,{})
 
 	if(len(resourceList)==0):
 		print('no pivot entity found')
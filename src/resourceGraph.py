@@ -1,32 +1,66 @@
 from collections import OrderedDict
+from colorAssignment import getColorList
 
 # Model class for resource elements
+# A deep search holds tens of thousands of resources and fact nodes : they have no per instance
+# dictionary (__slots__) and the URIs, labels and keywords are shared, so that the many resources
+# naming the same element of DBPedia hold a single copy of the strings.
+#
+# The shared strings are kept in a table of the class (sharedStrings) rather than the interpreter-wide one of sys.intern,
+# and the table is emptied once it holds maxSharedStrings of them, so that it stays bounded in a long-running server.
 class Resource:
+	__slots__ = ('uri','label','support','keyword','colors','score','isUri')
+
+	sharedStrings = {}				# key:string  value:the same string, the copy shared by the resources
+	maxSharedStrings = 100000		# Size of the table
+
 	def __init__(self,uri,label,support,keyword):		
-		self.uri = uri												# URI of the resource. 
-		self.label = label  										# Label of the resource
+		self.uri = Resource.share(uri)								# URI of the resource. 
+		self.label = Resource.share(label)							# Label of the resource
 		self.support = int(support)									# Importance/ represents the number of incoming links in DBPedia on to the resource
-		self.keyword = keyword										# Keyword represented by the resource
-		self.colors = []											# Colors assigned
+		self.keyword = Resource.share(keyword)						# Keyword represented by the resource
+		self.colors = 0												# Colors assigned (bitmask)
 		self.score = 0
 		self.isUri = False
 
+	# Returns the shared copy of the string
+	def share(value):
+		shared = Resource.sharedStrings.get(value)
+		if shared is None:
+			if(len(Resource.sharedStrings)>=Resource.maxSharedStrings):
+				Resource.sharedStrings.clear()
+			Resource.sharedStrings[value] = value
+			shared = value
+		return shared
+
+	# Returns the resource as a dictionary that can be serialized to JSON
+	def toDict(self):
+		return {'uri':self.uri,'label':self.label,'support':self.support,'keyword':self.keyword,'colors':getColorList(self.colors),'score':self.score,'isUri':self.isUri}
+
 # Fact node model class.
 # Fact node is a node that represents a RDF Triple.
 # In addition, we also maintain the keywords in the query that this fact node covers
 class FactNode:
+	__slots__ = ('subject','predicate','object','colors','children','score','isExplored')
+
 	def __init__(self,subject,predicate,object):
 		self.subject = subject										# Subject of the fact node
 		self.predicate = predicate									# Predicate
 		self.object = object										# Object
-		self.colors = []											# Colours
-		self.children = []											# Child Nodes
+		self.colors = 0												# Colours (bitmask)
+		self.children = None										# Child Nodes, the list is created with the first child
 		self.score = 0												# Represents the score of the the current fact node - This is a cumulative score
 		self.isExplored = False										# A boolean flag to check if the currect fact node is explored during search
 
 	# Used to add child node to current node    
 	def add_child(self, obj):
+		if self.children is None:
+			self.children = []
 		self.children.append(obj)
+
+	# Returns the fact node as a dictionary that can be serialized to JSON
+	def toDict(self):
+		return {'subject':self.subject.toDict(),'predicate':self.predicate.toDict(),'object':self.object.toDict(),'colors':getColorList(self.colors),'score':self.score}
 	
 	# Set colors of the fact node from the colors of subject , predicate and object resources
     # Eg. 
@@ -37,18 +71,7 @@ class FactNode:
 
     # 		then the fact node covers 1,2,3
 	def set_colors(self):
-			
-		for color in self.subject.colors:
-			if(color not in self.colors):
-				self.colors.append(color)
-
-		for color in self.predicate.colors:
-			if(color not in self.colors):
-				self.colors.append(color)
-		
-		for color in self.object.colors:
-			if(color not in self.colors):
-				self.colors.append(color)
+		self.colors |= self.subject.colors | self.predicate.colors | self.object.colors
 
 # Resource Graph Model class
 # This graph will have Fact nodes as the nodes which inturn will have Resources
@@ -0,0 +1,83 @@
+import threading
+from concurrent.futures import Future
+from instrumentation import Instrumentation, Span, noInstrumentation
+
+# Holds the state of a single keyword query
+# The same context is passed to every step of the search so that the work done for one pivot
+# element can be reused by the others
+class SearchContext:
+
+	instrument = False						# Record the spans and counters of the queries (see instrumentation.py)
+
+	def __init__(self,sentence):
+		self.sentence = sentence			# Keyword query
+		self.colorDictionary = {}			# key:token of the query  value:color (see ColorAssignment)
+		self.predicateScores = {}			# key:(keyword,predicate value)  value:Future holding the similarity score
+		self.resourceList = []				# Pivot elements
+		self.resultsList = []				# Ranked fact nodes
+		self.factNodeCount = 0				# Number of fact nodes found, resultsList only holds the best ones in top-k mode
+		self.timings = {}					# key:phase  value:seconds spent in the phase
+		self.instrumentation = Instrumentation() if SearchContext.instrument else noInstrumentation
+		self.lock = threading.Lock()
+
+	# Returns a context manager measuring a phase of the search into the timings
+	def phase(self,name):
+		return Span(self.instrumentation,name,timings=self.timings)
+
+	# Returns the future of the similarity score of the keyword and the predicate value, and a boolean
+	# telling if the caller is the first to ask for it. The first caller has to set the result of the future
+	def reservePredicateScore(self,keyword,predicateValue):
+		key = (keyword,predicateValue)
+		with self.lock:
+			future = self.predicateScores.get(key)
+			if future is None:
+				future = Future()
+				self.predicateScores[key] = future
+				return future,True
+			return future,False
+
+	# Returns the similarity score of the keyword and the predicate value
+	# The score is computed by scoreFunction only once per query, concurrent callers asking for the
+	# same pair wait for the first computation instead of starting their own
+	def getPredicateScore(self,keyword,predicateValue,scoreFunction):
+		future,isOwner = self.reservePredicateScore(keyword,predicateValue)
+
+		if isOwner:
+			try:
+				with self.instrumentation.span('similarity',keyword,'/',predicateValue):
+					future.set_result(scoreFunction(keyword,predicateValue))
+			except Exception as e:
+				future.set_exception(e)
+			self.instrumentation.count('predicatesScored')
+
+		return future.result()
+
+	# Tells if the similarity score of the keyword and the predicate value is known or being computed
+	def hasPredicateScore(self,keyword,predicateValue):
+		with self.lock:
+			return (keyword,predicateValue) in self.predicateScores
+
+	# Stores a score computed elsewhere (for example in a batch), unless the pair is already known
+	# Returns True when the score was stored
+	def setPredicateScore(self,keyword,predicateValue,score):
+		key = (keyword,predicateValue)
+		with self.lock:
+			if key in self.predicateScores:
+				return False
+			future = Future()
+			future.set_result(score)
+			self.predicateScores[key] = future
+			return True
+
+	# Returns the outcome of the search as a dictionary that can be serialized to JSON
+	# Only the first 'limit' fact nodes are included
+	def toDict(self,limit=50):
+		response = {}
+		response['query'] = self.sentence
+		response['pivots'] = [resource.toDict() for resource in self.resourceList]
+		response['count'] = self.factNodeCount
+		response['results'] = [factNode.toDict() for factNode in self.resultsList[:limit]]
+		response['timings'] = self.timings
+		if self.instrumentation is not noInstrumentation:
+			response['trace'] = self.instrumentation.toDict()
+		return response
@@ -0,0 +1,114 @@
+import json
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import graphSearch
+
+# Long running search server
+#
+# Keeps the interpreter, the caches and the similarity clients warm between queries and answers
+# them over HTTP/JSON :
+#
+#	GET  /search?q=<query>[&limit=<n>]
+#	POST /search   {"query": "<query>", "limit": <n>}
+#	GET  /health
+#
+# The response holds the pivot elements, the ranked fact nodes (at most 'limit') and the time
+# spent in each phase of the search (seconds).
+#
+# Every request is served by its own thread. The state of a query is held by its search context,
+# so concurrent queries share the caches and the connections but nothing else.
+#
+# Usage : python3 searchServer.py [--port 8080] [search options of graphSearch.py]
+class SearchServer(ThreadingHTTPServer):
+
+	def __init__(self,address,args):
+		ThreadingHTTPServer.__init__(self,address,SearchRequestHandler)
+		self.args = args							# Search options
+		self.defaultLimit = args.limit				# Number of fact nodes returned when the request does not say
+
+	# Runs the search and returns the response as a dictionary
+	def search(self,query,limit):
+		context = graphSearch.search(query,width=self.args.width,maxDepth=self.args.max_depth,maxFactNodes=self.args.max_fact_nodes,topK=limit)
+		return context.toDict(limit)
+
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+
+	def sendJson(self,status,body):
+		data = json.dumps(body).encode('utf-8')
+		self.send_response(status)
+		self.send_header('Content-Type','application/json')
+		self.send_header('Content-Length',str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+	def handleSearch(self,query,limit):
+		if not isinstance(query,str) or not query.strip():
+			self.sendJson(400,{'error':'missing query'})
+			return
+
+		# The limit is a JSON integer or the string of one (query string), int() would also take floats, booleans and lists
+		if limit is None:
+			limit = self.server.defaultLimit
+		else:
+			try:
+				if(isinstance(limit,bool) or not isinstance(limit,(int,str))):
+					raise TypeError('limit')
+				limit = int(limit)
+			except (TypeError,ValueError):
+				self.sendJson(400,{'error':'limit must be an integer'})
+				return
+
+		try:
+			self.sendJson(200,self.server.search(query.strip(),limit))
+		except Exception as e:
+			self.sendJson(500,{'error':str(e)})
+
+	def do_GET(self):
+		url = urlsplit(self.path)
+		if(url.path=='/health'):
+			self.sendJson(200,{'status':'ok'})
+		elif(url.path=='/search'):
+			parameters = parse_qs(url.query)
+			self.handleSearch(parameters.get('q',[None])[0],parameters.get('limit',[None])[0])
+		else:
+			self.sendJson(404,{'error':'not found'})
+
+	def do_POST(self):
+		if(urlsplit(self.path).path!='/search'):
+			self.sendJson(404,{'error':'not found'})
+			return
+
+		try:
+			length = int(self.headers.get('Content-Length',0))
+			request = json.loads(self.rfile.read(length).decode('utf-8'))
+		except ValueError:
+			request = None
+
+		if not isinstance(request,dict):
+			self.sendJson(400,{'error':'invalid JSON'})
+			return
+
+		self.handleSearch(request.get('query'),request.get('limit'))
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Keyword search server over DBPedia')
+	parser.add_argument('--host',default='127.0.0.1',help='Address the server listens on')
+	parser.add_argument('--port',type=int,default=8080,help='Port the server listens on')
+	parser.add_argument('--limit',type=int,default=50,help='Number of fact nodes returned when the request does not say')
+	graphSearch.addSearchArguments(parser)
+	args = parser.parse_args()
+	graphSearch.configureSearch(args)
+
+	server = SearchServer((args.host,args.port),args)
+	print('Listening on http://'+args.host+':'+str(args.port))
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	server.server_close()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,109 @@
+import json
+import asyncio
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from httpPool import HttpConnectionPool
+
+# Thread-safe client of the remote similarity services
+#
+# A single client is meant to be shared by every caller of the process :
+#	- the requests run on a persistent pool of worker threads and are returned as futures
+#	- the HTTP connections to the services are kept alive and reused, unless another transport
+#	  (see transport.py) is given
+#	- the scores are kept in the optional SimilarityStore
+class SimilarityClient:
+
+	def __init__(self,maxWorkers=16,maxConnections=8,timeout=10,store=None,transport=None):
+		self.executor = ThreadPoolExecutor(max_workers=maxWorkers)
+		if transport is None:
+			transport = HttpConnectionPool(maxConnections=maxConnections,timeout=timeout)
+		self.transport = transport							# Transport performing the requests
+		self.store = store									# Optional SimilarityStore
+
+	# 1 - EasyESA
+	def getEasyESARequest(word1,word2):
+		url = "http://vmdeb20.deri.ie:8890/esaservice?task=esa&term1="+quote(word1)+'&term2='+quote(word2)
+		return url,{}
+
+	def parseEasyESAScore(body):
+		return float(body.decode('utf-8').replace('\"',''))
+
+	# 2 - ws4j
+	def getWs4jRequest(word1,word2):
+		url = "http://ws4jdemo.appspot.com/ws4j?measure=wup&args="+quote(word1)+"%3A%3A"+quote(word2)
+		return url,{'Accept':'application/json'}
+
+	def parseWs4jScore(body):
+		# fetch json from the response
+		jsonStr = json.loads(body.decode('utf-8'))
+		return float(jsonStr['result'][0]['score'])
+
+	# 3 - UMBC Semantic Similarity service
+	#
+	#  Documentation availabel at http://swoogle.umbc.edu/SimService/api.html
+	def getSwoogleRequest(word1,word2):
+		url = "http://swoogle.umbc.edu/StsService/GetStsSim?operation=api&phrase1="+quote(word1)+'&phrase2='+quote(word2)
+		return url,{}
+
+	def parseSwoogleScore(body):
+		return float(body.decode('utf-8').replace('\"',''))
+
+	# key:service  value:(method building the URL and the headers of the request, method parsing the response)
+	services = {
+		'esa' : (getEasyESARequest,parseEasyESAScore),
+		'swoogle' : (getSwoogleRequest,parseSwoogleScore),
+		'ws4j' : (getWs4jRequest,parseWs4jScore)
+	}
+
+	# Queries the service, raises an exception if the request fails
+	def requestScore(self,service,word1,word2):
+		getRequest,parseScore = SimilarityClient.services[service]
+		url,headers = getRequest(word1,word2)
+		return parseScore(self.transport.get(url,headers))
+
+	# Returns the score of the service for the pair, from the store when it was scored before
+	# Failed requests score 0 and are not stored
+	def getScore(self,service,word1,word2):
+		if self.store is not None:
+			score = self.store.get(service,word1,word2)
+			if score is not None:
+				return score
+
+		try:
+			score = self.requestScore(service,word1,word2)
+		except Exception as e:
+			return 0
+
+		if self.store is not None:
+			self.store.put(service,word1,word2,score)
+		return score
+
+	# Same as getScore, the request goes through the asyncio client 'http'
+	# The store is a SQLite database, it is read and written on a worker thread so that the event loop never waits for the disk
+	async def getScoreAsync(self,service,word1,word2,http):
+		loop = asyncio.get_running_loop()
+		if self.store is not None:
+			score = await loop.run_in_executor(None,self.store.get,service,word1,word2)
+			if score is not None:
+				return score
+
+		getRequest,parseScore = SimilarityClient.services[service]
+		url,headers = getRequest(word1,word2)
+		try:
+			score = parseScore(await http.get(url,headers))
+		except Exception as e:
+			return 0
+
+		if self.store is not None:
+			await loop.run_in_executor(None,self.store.put,service,word1,word2,score)
+		return score
+
+	# Schedules getScore on the worker pool and returns its future
+	def submitScore(self,service,word1,word2):
+		return self.executor.submit(self.getScore,service,word1,word2)
+
+	def close(self):
+		self.executor.shutdown()
+		self.transport.close()
+		if self.store is not None:
+			self.store.close()
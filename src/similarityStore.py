@@ -0,0 +1,96 @@
+import sqlite3
+import sys
+import time
+import threading
+
+# Persistent store of the scores returned by the similarity services
+#
+# Scores are keyed by (service, word1, word2). The store is a SQLite database in WAL mode so that
+# several worker processes can read and write it at the same time. It keeps at most 'maxEntries'
+# scores and evicts the least recently used ones first.
+class SimilarityStore:
+
+	# A hit only refreshes the access time of a score that was not used for this many seconds
+	# This keeps most reads from taking the write lock of the database
+	accessResolution = 3600
+
+	def __init__(self,path,maxEntries=1000000):
+		self.path = path										# Location of the SQLite database
+		self.maxEntries = maxEntries							# Maximum number of scores kept
+		self.lock = threading.Lock()
+		self.writes = 0											# Number of scores stored since the size was last checked
+		self.hits = 0											# Number of lookups served by the store
+		self.misses = 0											# Number of lookups that had to query the service
+
+		self.connection = sqlite3.connect(path,timeout=30,check_same_thread=False)
+		self.connection.execute('PRAGMA journal_mode=WAL')
+		self.connection.execute("""
+			CREATE TABLE IF NOT EXISTS scores (
+				service TEXT NOT NULL,
+				word1 TEXT NOT NULL,
+				word2 TEXT NOT NULL,
+				score REAL NOT NULL,
+				accessed REAL NOT NULL,
+				PRIMARY KEY (service,word1,word2)
+			)""")
+		self.connection.execute('CREATE INDEX IF NOT EXISTS scores_accessed ON scores (accessed)')
+		self.connection.commit()
+
+	# Returns the stored score or None if the pair was never scored by the service
+	def get(self,service,word1,word2):
+		with self.lock:
+			row = self.connection.execute('SELECT score,accessed FROM scores WHERE service=? AND word1=? AND word2=?',(service,word1,word2)).fetchone()
+			if row is None:
+				self.misses += 1
+				return None
+
+			self.hits += 1
+			now = time.time()
+			if(row[1]<now-SimilarityStore.accessResolution):
+				self.connection.execute('UPDATE scores SET accessed=? WHERE service=? AND word1=? AND word2=?',(now,service,word1,word2))
+				self.connection.commit()
+
+			return row[0]
+
+	def put(self,service,word1,word2,score):
+		self.preload([(service,word1,word2,score)])
+
+	# Stores many scores in a single transaction
+	# rows : iterable of (service,word1,word2,score)
+	def preload(self,rows):
+		now = time.time()
+		with self.lock:
+			cursor = self.connection.executemany('INSERT OR REPLACE INTO scores VALUES (?,?,?,?,?)',((service,word1,word2,float(score),now) for service,word1,word2,score in rows))
+			self.writes += cursor.rowcount
+			self.connection.commit()
+
+			# Checking the size of the store on every write would cost a table scan each time
+			if(self.writes>=max(1,self.maxEntries//100)):
+				self.writes = 0
+				self.evict()
+
+	# Preloads a tab separated file with one 'service word1 word2 score' line per score
+	def preloadFile(self,path):
+		with open(path,encoding='utf-8') as scoreFile:
+			rows = (line.rstrip('\n').split('\t') for line in scoreFile if line.strip())
+			self.preload(rows)
+
+	# Evicts the least recently used scores once the store is full
+	# The caller holds the lock
+	def evict(self):
+		count = self.connection.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+		if(count>self.maxEntries):
+			self.connection.execute('DELETE FROM scores WHERE rowid IN (SELECT rowid FROM scores ORDER BY accessed LIMIT ?)',(count-self.maxEntries,))
+			self.connection.commit()
+
+	def close(self):
+		with self.lock:
+			self.connection.close()
+
+
+# Preloads scores into a store
+# python3 similarityStore.py similarityStore.db scores.tsv
+if __name__ == '__main__':
+	store = SimilarityStore(sys.argv[1])
+	store.preloadFile(sys.argv[2])
+	store.close()
@@ -0,0 +1,144 @@
+import sqlite3
+import json
+import time
+import zlib
+import threading
+from collections import OrderedDict
+
+# Two tier cache for the neighbourhood (?p ?o) of the pivot elements
+#
+# Tier 1 : in-process LRU dictionary (hot tier). Hits are served without touching the disk. It is
+#          bounded both in entries and in rows (bindings), as an entry can be a page of 10000 rows
+# Tier 2 : SQLite database on disk, shared between runs and between processes
+#
+# Entries are keyed by (endpoint, subject), expire after 'ttl' seconds and the disk tier
+# keeps at most 'maxEntries' rows, evicting the least recently used ones first. The size is checked
+# every maxEntries/100 writes, so the table may hold up to 1% more rows in between. SparqlClient keeps a
+# row per page of a neighbourhood (see SparqlClient.getCacheKey), so a row is a page and not a pivot.
+class SparqlCache:
+
+	# A hit only refreshes the access time of a row that was not used for this many seconds
+	# This keeps most reads from taking the write lock of the database (as in SimilarityStore)
+	accessResolution = 3600
+
+	def __init__(self,path,ttl=86400,maxEntries=10000,hotEntries=256,hotRows=100000):
+		self.path = path 										# Location of the SQLite database
+		self.ttl = ttl											# Time to live of an entry (seconds)
+		self.maxEntries = maxEntries							# Maximum number of rows kept on disk
+		self.hotEntries = hotEntries							# Maximum number of entries kept in memory
+		self.hotRows = hotRows									# Maximum number of rows kept in memory, larger entries are only kept on disk
+		self.hotTier = OrderedDict()							# key:(endpoint,subject)  value:(expiry time,bindings)
+		self.hotSize = 0										# Number of rows in the hot tier
+		self.writes = 0											# Number of rows stored since the size was last checked
+		self.hits = 0											# Number of lookups served by the cache
+		self.misses = 0											# Number of lookups that had to query the endpoint
+		self.lock = threading.Lock()
+
+		self.connection = sqlite3.connect(path,timeout=30,check_same_thread=False)
+		self.connection.execute('PRAGMA journal_mode=WAL')
+		self.connection.execute("""
+			CREATE TABLE IF NOT EXISTS triples (
+				endpoint TEXT NOT NULL,
+				subject TEXT NOT NULL,
+				bindings BLOB NOT NULL,
+				expires REAL NOT NULL,
+				accessed REAL NOT NULL,
+				PRIMARY KEY (endpoint,subject)
+			)""")
+		self.connection.execute('CREATE INDEX IF NOT EXISTS triples_accessed ON triples (accessed)')
+		self.connection.commit()
+
+	# Keeps the hot tier within its bounds
+	def addToHotTier(self,key,expires,bindings):
+		self.removeFromHotTier(key)
+		if(getRowCount(bindings)>self.hotRows):
+			return
+
+		self.hotTier[key] = (expires,bindings)
+		self.hotSize += getRowCount(bindings)
+		while(len(self.hotTier)>self.hotEntries or self.hotSize>self.hotRows):
+			expires,bindings = self.hotTier.popitem(last=False)[1]
+			self.hotSize -= getRowCount(bindings)
+
+	def removeFromHotTier(self,key):
+		if(key in self.hotTier):
+			self.hotSize -= getRowCount(self.hotTier.pop(key)[1])
+
+	# Returns the cached bindings for the subject or None if they are missing or stale
+	def get(self,endpoint,subject):
+		key = (endpoint,subject)
+		now = time.time()
+
+		with self.lock:
+			# Hot tier
+			if(key in self.hotTier):
+				expires,bindings = self.hotTier[key]
+				if(expires>now):
+					self.hotTier.move_to_end(key)
+					self.hits += 1
+					return bindings
+				self.removeFromHotTier(key)
+
+			# Disk tier
+			row = self.connection.execute('SELECT bindings,expires,accessed FROM triples WHERE endpoint=? AND subject=?',key).fetchone()
+			if row is None:
+				self.misses += 1
+				return None
+
+			if(row[1]<=now):
+				self.connection.execute('DELETE FROM triples WHERE endpoint=? AND subject=?',key)
+				self.connection.commit()
+				self.misses += 1
+				return None
+
+			if(row[2]<now-SparqlCache.accessResolution):
+				self.connection.execute('UPDATE triples SET accessed=? WHERE endpoint=? AND subject=?',(now,endpoint,subject))
+				self.connection.commit()
+
+			bindings = json.loads(zlib.decompress(row[0]).decode('utf-8'))
+			self.addToHotTier(key,row[1],bindings)
+			self.hits += 1
+			return bindings
+
+	# Stores the bindings returned by the endpoint for the subject
+	def put(self,endpoint,subject,bindings):
+		key = (endpoint,subject)
+		now = time.time()
+		expires = now + self.ttl
+		blob = zlib.compress(json.dumps(bindings).encode('utf-8'))
+
+		with self.lock:
+			self.addToHotTier(key,expires,bindings)
+			self.connection.execute('INSERT OR REPLACE INTO triples VALUES (?,?,?,?,?)',(endpoint,subject,blob,expires,now))
+			self.writes += 1
+			self.connection.commit()
+
+			# Checking the size of the disk tier on every write would cost a table scan each time (as in SimilarityStore)
+			if(self.writes>=max(1,self.maxEntries//100)):
+				self.writes = 0
+				self.evict()
+
+	# Evicts the least recently used rows once the disk tier is full
+	# The caller holds the lock
+	def evict(self):
+		count = self.connection.execute('SELECT COUNT(*) FROM triples').fetchone()[0]
+		if(count>self.maxEntries):
+			self.connection.execute('DELETE FROM triples WHERE rowid IN (SELECT rowid FROM triples ORDER BY accessed LIMIT ?)',(count-self.maxEntries,))
+			self.connection.commit()
+
+	# Removes every entry from both tiers
+	def clear(self):
+		with self.lock:
+			self.hotTier.clear()
+			self.hotSize = 0
+			self.connection.execute('DELETE FROM triples')
+			self.connection.commit()
+
+	def close(self):
+		with self.lock:
+			self.connection.close()
+
+
+# Returns the number of rows of a cached value : the bindings of a page, or a single spotlight response
+def getRowCount(bindings):
+	return len(bindings) if isinstance(bindings,list) else 1
@@ -1,11 +1,14 @@
 import json
+import asyncio
 import inflection
-from SPARQLWrapper import SPARQLWrapper, JSON , XML
-from colorAssignment import ColorAssignment
+from urllib.parse import quote
+from httpPool import HttpConnectionPool
+from colorAssignment import getColorBit
 from wordSimilarity import WordSimilarity
 from collections import OrderedDict
 from resourceGraph import Resource
 from resourceGraph import FactNode
+from instrumentation import noInstrumentation
 
 # This represents a DBPedia triplet object
 class DBPediaTriplet:
@@ -19,6 +22,131 @@ class DBPediaTriplet:
 # This represents the sparql quering engine
 class SparqlClient :
 
+	endpoint = "http://dbpedia.org/sparql"		# SPARQL endpoint that is queried
+	cache = None								# Optional SparqlCache holding the neighbourhoods that were already fetched
+	transport = HttpConnectionPool()			# Transport performing the requests (see transport.py)
+	store = None								# Optional local TripleStore answering the lookups instead of the endpoint
+	pageSize = 10000							# Number of triplets fetched per request, larger neighbourhoods are fetched a page at a time
+
+	# Last part of the URI of the predicates that we do not want to consider
+	vocabDictionary = ['rdf-schema#comment','22-rdf-syntax-ns#type','abstract','owl#sameAs','subject']
+
+	# Returns the query retrieving a page of the triplets that have pivot element as subject
+	# The endpoint leaves out the rows that getFactNodes and filterPredicates would drop anyway :
+	# literals in another language than English, and the predicates of the vocab dictionary
+	# The rows are ordered so that consecutive pages neither overlap nor skip rows
+	def getQuery(pivotElement,offset=0):
+		predicateFilter = ' && '.join('!STRENDS(STR(?p),"/' + predicateValue + '")' for predicateValue in SparqlClient.vocabDictionary)
+		return """
+		    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>			
+		    SELECT ?p ?o
+		    WHERE {  """ + pivotElement + """ ?p ?o .
+		      FILTER (!isLiteral(?o) || lang(?o) = "" || langMatches(lang(?o),"en"))
+		      FILTER (""" + predicateFilter + """)
+		      }
+		    ORDER BY ?p ?o
+		    LIMIT """ + str(SparqlClient.pageSize) + """ OFFSET """ + str(offset) + """
+		      """
+
+	# Returns the URL of the SPARQL protocol GET request retrieving a page of the neighbourhood of the pivot element
+	def getQueryUrl(pivotElement,offset=0):
+		return SparqlClient.endpoint + '?query=' + quote(SparqlClient.getQuery(pivotElement,offset)) + '&format=' + quote('application/sparql-results+json')
+
+	# Returns the key of a page of the neighbourhood in the cache
+	def getCacheKey(pivotElement,offset):
+		return pivotElement + ' ' + str(SparqlClient.pageSize) + ' ' + str(offset)
+
+	# Returns the ?p ?o bindings of a page of the neighbourhood of the pivot element, served from the cache when possible
+	# Returns None if the endpoint could not be reached
+	def getBindingsPage(pivotElement,offset,instrumentation=noInstrumentation):
+
+		if SparqlClient.cache is not None:
+			bindings = SparqlClient.cache.get(SparqlClient.endpoint,SparqlClient.getCacheKey(pivotElement,offset))
+			if bindings is not None:
+				return bindings
+
+		# Queries the endpoint to retrive the triplets that have pivot element as subject
+		try:
+			with instrumentation.span('sparql',pivotElement,'OFFSET',offset):
+				results = json.loads(SparqlClient.transport.get(SparqlClient.getQueryUrl(pivotElement,offset),{'Accept':'application/sparql-results+json'}).decode('utf-8'))
+		except Exception as e:
+			print(e)
+			print(' DBPedia is down for maintanance')				# Exception
+			return None
+
+		bindings = results["results"]["bindings"]
+		if SparqlClient.cache is not None:
+			SparqlClient.cache.put(SparqlClient.endpoint,SparqlClient.getCacheKey(pivotElement,offset),bindings)
+
+		return bindings
+
+	# Same as getBindingsPage, the query is sent through the asyncio client 'http'
+	# The cache is a SQLite database, it is read and written on a worker thread so that the event loop never waits for the disk
+	async def getBindingsPageAsync(pivotElement,offset,http,instrumentation=noInstrumentation):
+		loop = asyncio.get_running_loop()
+
+		if SparqlClient.cache is not None:
+			bindings = await loop.run_in_executor(None,SparqlClient.cache.get,SparqlClient.endpoint,SparqlClient.getCacheKey(pivotElement,offset))
+			if bindings is not None:
+				return bindings
+
+		try:
+			with instrumentation.span('sparql',pivotElement,'OFFSET',offset):
+				results = json.loads((await http.get(SparqlClient.getQueryUrl(pivotElement,offset),{'Accept':'application/sparql-results+json'})).decode('utf-8'))
+		except Exception as e:
+			print(e)
+			print(' DBPedia is down for maintanance')				# Exception
+			return None
+
+		bindings = results["results"]["bindings"]
+		if SparqlClient.cache is not None:
+			await loop.run_in_executor(None,SparqlClient.cache.put,SparqlClient.endpoint,SparqlClient.getCacheKey(pivotElement,offset),bindings)
+
+		return bindings
+
+	# Yields the ?p ?o bindings of the pivot element a page at a time, from the local store when there is one
+	# A page shorter than pageSize is the last one. The pages fetched before a failure are still yielded
+	def getBindingPages(pivotElement,instrumentation=noInstrumentation):
+
+		if SparqlClient.store is not None:
+			yield SparqlClient.store.getBindings(pivotElement)
+			return
+
+		offset = 0
+		while True:
+			bindings = SparqlClient.getBindingsPage(pivotElement,offset,instrumentation)
+			if bindings is None:
+				return
+			yield bindings
+			if(len(bindings)<SparqlClient.pageSize):
+				return
+			offset += SparqlClient.pageSize
+
+	# Same as getBindingPages, the next page is requested while the current one is processed
+	async def getBindingPagesAsync(pivotElement,http,instrumentation=noInstrumentation):
+
+		if SparqlClient.store is not None:
+			yield SparqlClient.store.getBindings(pivotElement)
+			return
+
+		offset = 0
+		page = asyncio.ensure_future(SparqlClient.getBindingsPageAsync(pivotElement,offset,http,instrumentation))
+		try:
+			while page is not None:
+				bindings = await page
+				if bindings is None:
+					return
+
+				page = None
+				if(len(bindings)>=SparqlClient.pageSize):
+					offset += SparqlClient.pageSize
+					page = asyncio.ensure_future(SparqlClient.getBindingsPageAsync(pivotElement,offset,http,instrumentation))
+				yield bindings
+		finally:
+			# The pages are no longer wanted (the budget of the search is spent), drop the one requested in advance
+			if page is not None:
+				page.cancel()
+
 	def findAverageScorePhraseSentence(keyword,actualPredicateValue):
 		score = 0
 		count = 0 
@@ -41,32 +169,33 @@ class SparqlClient :
 		else:
 			return -1
 
-	# This method is used to filter the predicates
-	def filterPredicates(predicate,keywordList):
-
-		# vocab dictionary contains the predicates that we do not want to consider
-		vocabDictionary = ['rdf-schema#comment','22-rdf-syntax-ns#type','abstract','owl#sameAs','subject']
+	# Returns the similarity score of a keyword and a predicate, -1 if they are not similar
+	def getPredicateScore(keyword,actualPredicateValue):
+		if(keyword.lower()==actualPredicateValue.lower()):
+			return 3.0
+		#elif(isPhraseSentence):
+			#score = SparqlClient.findAverageScorePhraseSentence(keyword,actualPredicateValue)
+			#print('phrase'+str(score))
+		else:
+			return WordSimilarity.isPredicateSimilar(keyword,actualPredicateValue)
 
-		predicateList = []
+	# Returns the property of the predicate URI and its value as a phrase
+	# http://dbpedia.org/ontology/birthPlace -----> ('birthPlace','birth place')
+	# Returns None for the predicates that we do not want to consider
+	def getActualPredicateValue(predicate):
 
 		# from the predicate URI, just consider the property and ignore the vocabulary
 		# http://dbpedia.org/resource/Name  -----> consider 'Name'
 		predicateValue = predicate.split('/')[-1]
 
 		# ignore if the predicate property is in vocab dictionary
-		if(predicateValue in vocabDictionary):
-			return predicateList
+		# The query already excludes them, but the cache and the local store may hold unfiltered neighbourhoods
+		if(predicateValue in SparqlClient.vocabDictionary):
+			return None
 		
-		# Boolean value indicating phrase sentence
-		isPhraseSentence = False
-
 		# Handles the camel case properties
 		# camel cases will be returned seperated by _
 		camelCaseValue = inflection.underscore(predicateValue)
-		if '_' in camelCaseValue:
-			isPhraseSentence = True
-		else:
-			isPhraseSentence = False
 
 		predicateValues = camelCaseValue.split('_')
 		
@@ -77,21 +206,92 @@ class SparqlClient :
 			actualPredicateValue = actualPredicateValue + ' ' + value
 
 		actualPredicateValue = actualPredicateValue.strip()
-		
+
+		return (predicateValue,actualPredicateValue)
+
+	# Returns the distinct predicate values (as phrases) of a neighbourhood
+	def getActualPredicateValues(bindings):
+		actualPredicateValues = []
+		seen = set()
+		for result in bindings:
+			predicateValues = SparqlClient.getActualPredicateValue(result["p"]["value"])
+			if predicateValues is not None and predicateValues[1] not in seen:
+				seen.add(predicateValues[1])
+				actualPredicateValues.append(predicateValues[1])
+		return actualPredicateValues
+
+	# Scores all the predicates of a neighbourhood against the uncovered keywords at once
+	# and stores the scores in the search context, so that filterPredicates finds them there.
+	# Only the pairs the query has not scored yet are sent to the batch.
+	# This is only done when the similarity backend can score the pairs in a batch, returns False otherwise
+	def scorePredicates(bindings,keywordList,context):
+
+		if not WordSimilarity.canScoreBatches():
+			return False
+
+		# Keywords and predicates having at least one pair left to score
+		pairs = [(keyword,actualPredicateValue) for actualPredicateValue in SparqlClient.getActualPredicateValues(bindings) for keyword in keywordList if not context.hasPredicateScore(keyword,actualPredicateValue)]
+		if(len(pairs)==0):
+			return True
+		keywords = list(OrderedDict.fromkeys(pair[0] for pair in pairs))
+		actualPredicateValues = list(OrderedDict.fromkeys(pair[1] for pair in pairs))
+
+		scores = WordSimilarity.getBatchScores(keywords,actualPredicateValues)
+		stored = 0
+		for (keyword,actualPredicateValue),score in scores.items():
+			if(keyword.lower()==actualPredicateValue.lower()):
+				score = 3.0
+			if context.setPredicateScore(keyword,actualPredicateValue,score):
+				stored += 1
+		context.instrumentation.count('predicatesScored',stored)
+		return True
+
+	# Scores all the (keyword,predicate) pairs of a neighbourhood concurrently through the asyncio client 'http'
+	# and stores the scores in the search context. Pairs already scored (or being scored) for the query are skipped
+	async def scorePredicatesAsync(bindings,keywordList,context,http):
+
+		if SparqlClient.scorePredicates(bindings,keywordList,context):
+			return
+
+		async def scorePredicate(future,keyword,actualPredicateValue):
+			try:
+				if(keyword.lower()==actualPredicateValue.lower()):
+					future.set_result(3.0)
+				else:
+					with context.instrumentation.span('similarity',keyword,'/',actualPredicateValue):
+						future.set_result(await WordSimilarity.isPredicateSimilarAsync(keyword,actualPredicateValue,http))
+			except Exception as e:
+				future.set_exception(e)
+			context.instrumentation.count('predicatesScored')
+
+		pending = []
+		for actualPredicateValue in SparqlClient.getActualPredicateValues(bindings):
+			for keyword in keywordList:
+				future,isOwner = context.reservePredicateScore(keyword,actualPredicateValue)
+				if isOwner:
+					pending.append(scorePredicate(future,keyword,actualPredicateValue))
+				elif not future.done():
+					# Being scored by another exploration of the query
+					pending.append(asyncio.wrap_future(future))
+
+		await asyncio.gather(*pending,return_exceptions=True)
+
+	# This method is used to filter the predicates
+	# The similarity scores are memoized in the search context
+	def filterPredicates(predicate,keywordList,context):
+
+		predicateList = []
+
+		predicateValues = SparqlClient.getActualPredicateValue(predicate)
+		if predicateValues is None:
+			return predicateList
+
+		predicateValue,actualPredicateValue = predicateValues
 		
 		# iterate over each uncovered keyword and check if the predicate is semantically similar to the keyword
 		for keyword in keywordList:
-			# semantic similarity
-			if(keyword.lower()==actualPredicateValue.lower()):
-				score = 3.0
-			#elif(isPhraseSentence):
-				#score = SparqlClient.findAverageScorePhraseSentence(keyword,actualPredicateValue)
-				#print('phrase'+str(score))
-			else:
-				score = WordSimilarity.isPredicateSimilar(keyword,actualPredicateValue)
-				#print(' no phrase'+str(score))
-			
-			
+			# semantic similarity, computed once per query for every (keyword,predicate) pair
+			score = context.getPredicateScore(keyword,actualPredicateValue,SparqlClient.getPredicateScore)
 
 			if(score!=-1):	
 				predicateObject = Resource('<'+predicate+'>',predicateValue,0,keyword)
@@ -99,7 +299,7 @@ class SparqlClient :
 				# bi-gram scenario
 				individualKeyword = keyword.split(' ')
 				for key in individualKeyword:
-					predicateObject.colors.append(ColorAssignment.colorDictionary[key])
+					predicateObject.colors |= getColorBit(context.colorDictionary[key])
 
 				predicateObject.score = score
 				predicateObject.isUri = True
@@ -110,81 +310,111 @@ class SparqlClient :
 
 
 	# This method is used to get the list of keywords that is not covered by the current element	
-	def getUncoveredKeywords(colorList,biGramList):
+	def getUncoveredKeywords(colors,biGramList,colorDictionary):
 		keywordList = []
 		
-		# Join the list to make it a single string
-		pivotColors = ''.join(str(x) for x in colorList)			
-		
 		# Suppose we want to explore uncovered bi-grams, include them in the list
 		if(len(biGramList)>0):
 			keywordList.extend(biGramList)
 
 		# make use of the color dictionary to identify uncovered keywords
-		for keyword,color in ColorAssignment.colorDictionary.items():
-			if(str(color) not in pivotColors):
+		for keyword,color in colorDictionary.items():
+			if(not colors & getColorBit(color)):
 				keywordList.append(keyword)
 
 		return keywordList
 
 
-	def findObjectKeywordMatch(object):
+	def findObjectKeywordMatch(object,colorDictionary):
 		
 		# get the object value
 		objectVal = object.label
 
-		# Join the list to make it a single string
-		colors = ''.join(str(x) for x in object.colors)			
-
 		# make use of the color dictionary to identify uncovered keywords
-		for keyword,color in ColorAssignment.colorDictionary.items():
-			if(str(color) not in colors):
+		for keyword,color in colorDictionary.items():
+			if(not object.colors & getColorBit(color)):
 				if(keyword == objectVal):
 					object.score = object.score + 3.0
-					object.colors.append(color)
+					object.colors |= getColorBit(color)
 		
 		return object
 
 
 
 	# Returns the triples for the pivot element
-	def getAllTripletsForPivotElement(resource,biGramList):
-		print(' Exploring ... ')
+	def getAllTripletsForPivotElement(resource,biGramList,context):
 		tripletList = []
+		for factNodes in SparqlClient.getTripletPages(resource,biGramList,context):
+			tripletList.extend(factNodes)
+		return tripletList
+
+	# Yields the triples for the pivot element, a page of its neighbourhood at a time
+	# The search merges every page as soon as it is formed (see FrontierScheduler)
+	def getTripletPages(resource,biGramList,context):
+		print(' Exploring ... ')
 		# Get the URI of the element
 		pivotElement = resource.uri									
 		print(pivotElement)
 		print('Current label : ' + resource.label)
 		
 		# Get a list of keywords that the current element does not cover
-		keywordList = SparqlClient.getUncoveredKeywords(resource.colors,biGramList)
+		keywordList = SparqlClient.getUncoveredKeywords(resource.colors,biGramList,context.colorDictionary)
 		print('Keywords yet to cover : ' + str(keywordList))
 
 		# If the resource covers all keywords, stop exploring this node
 		if(len(keywordList)==0):
-			return tripletList
+			return
 
 
-		sparql = SPARQLWrapper("http://dbpedia.org/sparql")			# Assigns an endpoint
-		sparql.setReturnFormat(JSON)								# Sets the return format to be json
-		# Queries the endpoint to retrive all the triplets that have pivot element as subject
-		sparql.setQuery("""
-		    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>			
-		    SELECT ?p ?o
-		    WHERE {  """ + pivotElement + """ ?p ?o
-		      }
-		      """)
-			
+		# Score the neighbourhood and form its fact nodes a page at a time, so that a single page is held in memory
+		yield from SparqlClient.getFactNodePages(resource,keywordList,context)
+
+	# Yields the fact nodes of the resource, a page of its neighbourhood at a time
+	def getFactNodePages(resource,keywordList,context):
+		for bindings in SparqlClient.getBindingPages(resource.uri,context.instrumentation):
+			context.instrumentation.count('triplesFetched',len(bindings))
+
+			# Score the predicates of the page in one batch when the similarity backend allows it
+			SparqlClient.scorePredicates(bindings,keywordList,context)
+
+			yield SparqlClient.getFactNodes(resource,bindings,keywordList,context)
+
+	# Same as getAllTripletsForPivotElement, all the requests go through the asyncio client 'http'
+	async def getAllTripletsForPivotElementAsync(resource,biGramList,context,http):
+		tripletList = []
+		async for factNodes in SparqlClient.getTripletPagesAsync(resource,biGramList,context,http):
+			tripletList.extend(factNodes)
+		return tripletList
+
+	# Same as getTripletPages, all the requests go through the asyncio client 'http'
+	async def getTripletPagesAsync(resource,biGramList,context,http):
+		print(' Exploring ... ')
+		print(resource.uri)
+		print('Current label : ' + resource.label)
+
+		keywordList = SparqlClient.getUncoveredKeywords(resource.colors,biGramList,context.colorDictionary)
+		print('Keywords yet to cover : ' + str(keywordList))
+
+		if(len(keywordList)==0):
+			return
+
+		pages = SparqlClient.getBindingPagesAsync(resource.uri,http,context.instrumentation)
 		try:
-			results = sparql.query().convert()
-		except Exception as e:
-			print(e)
-			print(' DBPedia is down for maintanance')				# Exception
-			return tripletList
+			async for bindings in pages:
+				context.instrumentation.count('triplesFetched',len(bindings))
+
+				# Once every pair of the page is scored, getFactNodes finds all the scores in the context
+				await SparqlClient.scorePredicatesAsync(bindings,keywordList,context,http)
+				yield SparqlClient.getFactNodes(resource,bindings,keywordList,context)
+		finally:
+			await pages.aclose()
+
+	# Forms the fact nodes of the resource from its neighbourhood
+	def getFactNodes(resource,bindings,keywordList,context):
+		tripletList = []
 
-		
 		# Find predicates that are semantically similar to uncovered keywords 
-		for result in results["results"]["bindings"]:
+		for result in bindings:
 
 			# Considering only 'en' language
 			if(result["o"]["type"]!= 'uri' ):
@@ -193,7 +423,7 @@ class SparqlClient :
 
 			
 			# Get the sematically similar predicates
-			predicateList = SparqlClient.filterPredicates(result["p"]["value"],keywordList)
+			predicateList = SparqlClient.filterPredicates(result["p"]["value"],keywordList,context)
 			
 			if len(predicateList)!=0:
 				for predicate in predicateList:
@@ -222,15 +452,9 @@ class SparqlClient :
 						object.isUri = True
 
 					object.score = resource.score + predicate.score
-					for color in resource.colors:
-						if(color not in object.colors):
-							object.colors.append(color)
-
-					for color in predicate.colors:
-						if(color not in object.colors):
-							object.colors.append(color)
+					object.colors |= resource.colors | predicate.colors
 
-					object = SparqlClient.findObjectKeywordMatch(object)
+					object = SparqlClient.findObjectKeywordMatch(object,context.colorDictionary)
 
 					factNodeObj = FactNode(resource,predicate,object)
 					factNodeObj.score = object.score
@@ -239,7 +463,7 @@ class SparqlClient :
 			'''
 			else:
 				
-				objectList = SparqlClient.filterPredicates(result["o"]["value"],keywordList)
+				objectList = SparqlClient.filterPredicates(result["o"]["value"],keywordList,context)
 				
 				for objectResource in objectList:
 					
@@ -261,21 +485,17 @@ class SparqlClient :
 					predicate.isUri = True
 
 					object.score = resource.score + object.score
-					for color in resource.colors:
-						if(color not in object.colors):
-							object.colors.append(color)
+					object.colors |= resource.colors | predicate.colors
 
-					for color in predicate.colors:
-						if(color not in object.colors):
-							object.colors.append(color)
-
-					object = SparqlClient.findObjectKeywordMatch(object)
+					object = SparqlClient.findObjectKeywordMatch(object,context.colorDictionary)
 
 					factNodeObj = FactNode(resource,predicate,object)
 					factNodeObj.score = object.score
 					factNodeObj.set_colors()
 					tripletList.append(factNodeObj)
 			'''
+		context.instrumentation.count('factNodesCreated',len(tripletList))
+
 		# Sort the list and return
 		return tripletList
 
@@ -0,0 +1,84 @@
+from array import array
+
+# Sorted table of strings stored in a memory-mapped file
+#
+# The strings are numbered in sorted (UTF-8 byte) order, so the number of a string is found by
+# bisection and a range of numbers holds all the strings sharing a prefix. The section is made of
+#	- the number of strings n (unsigned 64 bit integer)
+#	- n+1 offsets of the strings in the data (unsigned 64 bit integers)
+#	- the UTF-8 data of the strings, one after the other
+# padded to a multiple of 8 bytes, so that the section that follows it can be cast to integers too.
+# The integers are written in the byte order of the machine building the file.
+class StringTable:
+
+	def __init__(self,buffer,position=0):
+		self.buffer = buffer														# memoryview of the file
+		self.count = buffer[position:position+8].cast('Q')[0]						# Number of strings
+		self.offsets = buffer[position+8:position+8*(self.count+2)].cast('Q')		# Offsets of the strings in the data
+		self.dataStart = position+8*(self.count+2)									# Position of the data in the buffer
+		self.end = align(self.dataStart+self.offsets[self.count])					# Position following the section
+
+	def __len__(self):
+		return self.count
+
+	# Returns the UTF-8 bytes of the string 'number'
+	def getBytes(self,number):
+		return bytes(self.buffer[self.dataStart+self.offsets[number]:self.dataStart+self.offsets[number+1]])
+
+	def get(self,number):
+		return self.getBytes(number).decode('utf-8')
+
+	# Returns the number of the first string that is not lower than 'key' (UTF-8 bytes)
+	def lowerBound(self,key):
+		low,high = 0,self.count
+		while(low<high):
+			middle = (low+high)//2
+			if(self.getBytes(middle)<key):
+				low = middle+1
+			else:
+				high = middle
+		return low
+
+	# Returns the number of the string, -1 if it is not in the table
+	def find(self,string):
+		key = string.encode('utf-8')
+		number = self.lowerBound(key)
+		if(number<self.count and self.getBytes(number)==key):
+			return number
+		return -1
+
+	# Releases the views of the buffer, so that the file can be unmapped
+	def close(self):
+		self.offsets.release()
+		self.buffer.release()
+
+	# Writes the section of the strings to a binary file
+	# The strings have to be unique and sorted in UTF-8 byte order, see sortStrings
+	def write(output,strings):
+		data = [string.encode('utf-8') for string in strings]
+
+		offsets = array('Q',[len(data)])
+		position = 0
+		offsets.append(position)
+		for string in data:
+			position += len(string)
+			offsets.append(position)
+
+		output.write(offsets.tobytes())
+		for string in data:
+			output.write(string)
+		writePadding(output)
+
+
+# Returns the strings sorted in the order of the table
+def sortStrings(strings):
+	return sorted(strings,key=lambda string: string.encode('utf-8'))
+
+# Rounds a position up to a multiple of 8 bytes
+def align(position):
+	return (position+7)//8*8
+
+# Pads a binary file to a multiple of 8 bytes
+def writePadding(output):
+	position = output.tell()
+	output.write(b'\0'*(align(position)-position))
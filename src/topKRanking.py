@@ -0,0 +1,48 @@
+import heapq
+import threading
+from colorAssignment import countColors
+
+# Returns the ranking key of a fact node : number of keywords covered, then score
+def getRankingKey(factNode):
+	return (countColors(factNode.colors),factNode.score)
+
+# Keeps the k best fact nodes seen so far
+#
+# The fact nodes are ranked coverage first followed by the scores, fact nodes with the same coverage
+# and score keep the order they were added in (as rankResults does). The ranking can be fed while the
+# graph is explored, a level at a time, and only holds k fact nodes : a min-heap whose root is the
+# worst of the k best, replaced whenever a better fact node comes in.
+class TopKRanking:
+
+	def __init__(self,k):
+		self.k = max(0,int(k))						# Number of fact nodes kept
+		self.heap = []								# (coverage,score,-sequence number,fact node)
+		self.count = 0								# Number of fact nodes added so far
+		self.lock = threading.Lock()
+
+	def add(self,factNode):
+		with self.lock:
+			self.push(factNode)
+
+	# Adds fact nodes in order, as list.extend does
+	def extend(self,factNodes):
+		with self.lock:
+			for factNode in factNodes:
+				self.push(factNode)
+
+	# The caller holds the lock
+	def push(self,factNode):
+		coverage,score = getRankingKey(factNode)
+		# The earlier fact node wins a tie, the sequence number is unique so fact nodes are never compared
+		entry = (coverage,score,-self.count,factNode)
+		self.count += 1
+
+		if(len(self.heap)<self.k):
+			heapq.heappush(self.heap,entry)
+		elif(self.heap and entry>self.heap[0]):
+			heapq.heapreplace(self.heap,entry)
+
+	# Returns the fact nodes kept, best first
+	def getResults(self):
+		with self.lock:
+			return [entry[3] for entry in sorted(self.heap,reverse=True)]
@@ -0,0 +1,153 @@
+import gzip
+import json
+import time
+import asyncio
+import os
+import atexit
+import threading
+
+# Record-and-replay transports of the HTTP requests made to Spotlight, the SPARQL endpoint and the
+# similarity services
+#
+# A transport performs GET requests : get(url,headers) returns the body of the response and raises
+# an IOError if the request fails. The live transports are HttpConnectionPool (worker threads, see
+# httpPool.py) and AsyncHttpClient (asyncio, see asyncHttp.py), whose get is a coroutine.
+#
+# The recording transports pass the requests on to a live transport and keep the responses in a
+# TransportArchive. The replay transports answer the requests from the archive without touching the
+# network, after an injected latency :
+#	- a number of seconds, the same for every request
+#	- 'recorded', the time the request took when it was recorded
+# A request that is not in the archive fails as if the service was unreachable.
+
+# Compact on-disk archive of the responses, keyed by URL
+#
+# The archive is a gzip file with one JSON record {"url","body","seconds"} per line. It is read once
+# when opened, new responses are appended in batches of 'flushSize', on close and when the program exits.
+class TransportArchive:
+
+	def __init__(self,path,flushSize=100):
+		self.path = path							# Location of the archive
+		self.flushSize = flushSize					# Number of new responses written at once
+		self.responses = {}							# key:URL  value:(body,seconds the request took)
+		self.pending = []							# Records not written yet
+		self.lock = threading.Lock()
+
+		if os.path.exists(path):
+			with gzip.open(path,'rt',encoding='utf-8') as archiveFile:
+				for line in archiveFile:
+					record = json.loads(line)
+					self.responses[record['url']] = (record['body'].encode('utf-8','surrogateescape'),record['seconds'])
+
+		atexit.register(self.close)
+
+	# Returns (body,seconds) of the URL, None if it was not recorded
+	def get(self,url):
+		return self.responses.get(url)
+
+	def put(self,url,body,seconds):
+		with self.lock:
+			if url in self.responses:
+				return
+			self.responses[url] = (body,seconds)
+			# Bodies that are not valid UTF-8 survive the round trip through the escaped surrogates
+			self.pending.append(json.dumps({'url':url,'body':body.decode('utf-8','surrogateescape'),'seconds':seconds}))
+			if(len(self.pending)>=self.flushSize):
+				self.flush()
+
+	# Appends the pending records to the file, the caller holds the lock
+	def flush(self):
+		if self.pending:
+			# Every flush adds a gzip member, which gzip reads back as a single stream
+			with gzip.open(self.path,'at',encoding='utf-8') as archiveFile:
+				archiveFile.write('\n'.join(self.pending)+'\n')
+			self.pending = []
+
+	def close(self):
+		with self.lock:
+			self.flush()
+
+
+# Records the responses of a live transport
+class RecordingTransport:
+
+	def __init__(self,transport,archive):
+		self.transport = transport					# Live transport performing the requests
+		self.archive = archive						# TransportArchive receiving the responses
+
+	def get(self,url,headers=None):
+		start = time.monotonic()
+		body = self.transport.get(url,headers)
+		self.archive.put(url,body,time.monotonic()-start)
+		return body
+
+	def close(self):
+		self.transport.close()
+		self.archive.close()
+
+
+# Answers the requests from an archive
+class ReplayTransport:
+
+	def __init__(self,archive,latency=0):
+		self.archive = archive						# TransportArchive holding the responses
+		self.latency = latency						# Seconds waited before answering, or 'recorded'
+
+	# Returns (body,seconds to wait) of the URL, raises an IOError if it was not recorded
+	def getResponse(self,url):
+		response = self.archive.get(url)
+		if response is None:
+			raise IOError(url + ' is not in the archive ' + self.archive.path)
+
+		body,seconds = response
+		if(self.latency=='recorded'):
+			return body,seconds
+		return body,float(self.latency)
+
+	def get(self,url,headers=None):
+		body,seconds = self.getResponse(url)
+		if(seconds>0):
+			time.sleep(seconds)
+		return body
+
+	def close(self):
+		self.archive.close()
+
+
+# Same as RecordingTransport, for an asyncio live transport
+class AsyncRecordingTransport(RecordingTransport):
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self,excType,excValue,traceback):
+		await self.close()
+
+	async def get(self,url,headers=None):
+		start = time.monotonic()
+		body = await self.transport.get(url,headers)
+		self.archive.put(url,body,time.monotonic()-start)
+		return body
+
+	async def close(self):
+		await self.transport.close()
+		self.archive.close()
+
+
+# Same as ReplayTransport, the latency is waited without blocking the event loop
+class AsyncReplayTransport(ReplayTransport):
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self,excType,excValue,traceback):
+		await self.close()
+
+	async def get(self,url,headers=None):
+		body,seconds = self.getResponse(url)
+		if(seconds>0):
+			await asyncio.sleep(seconds)
+		return body
+
+	async def close(self):
+		self.archive.close()
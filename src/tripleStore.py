@@ -0,0 +1,167 @@
+import re
+import sys
+import gzip
+import mmap
+from array import array
+from stringTable import StringTable, sortStrings, align, writePadding
+
+# Local, read-only triple store answering the '<pivot> ?p ?o' lookups of SparqlClient
+#
+# The store is a single file built once from N-Triples :
+#	- the header : magic number and number of triples n
+#	- the terms (URIs, literals and blank nodes as written in N-Triples), in a StringTable
+#	- the SPO index : n (subject,predicate,object) triples of term numbers, sorted
+#	- the POS index : the same triples as (predicate,object,subject), sorted
+# The file is memory-mapped, a lookup bisects the index without reading the rest of the file, and
+# the pages are shared by all the processes that open the same store.
+#
+# Usage : python3 tripleStore.py dbpedia.nt[.gz] dbpedia.store
+class TripleStore:
+
+	magic = b'GKSTORE1'
+
+	def __init__(self,path):
+		self.path = path
+		self.file = open(path,'rb')
+		self.mmap = mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+		buffer = memoryview(self.mmap)
+
+		if(bytes(buffer[0:8])!=TripleStore.magic):
+			raise ValueError(path + ' is not a triple store')
+
+		self.count = buffer[8:16].cast('Q')[0]					# Number of triples
+		self.terms = StringTable(buffer,16)						# Terms, numbered in sorted order
+
+		position = self.terms.end
+		self.spo = buffer[position:position+12*self.count].cast('I')
+		position = align(position+12*self.count)
+		self.pos = buffer[position:position+12*self.count].cast('I')
+
+	# Returns the (start,end) range of the triples of the index starting with 'key' (tuple of term numbers)
+	def getRange(self,index,key):
+		width = len(key)
+
+		low,high = 0,self.count
+		while(low<high):
+			middle = (low+high)//2
+			if(tuple(index[3*middle:3*middle+width])<key):
+				low = middle+1
+			else:
+				high = middle
+		start = low
+
+		high = self.count
+		while(low<high):
+			middle = (low+high)//2
+			if(tuple(index[3*middle:3*middle+width])<=key):
+				low = middle+1
+			else:
+				high = middle
+
+		return start,low
+
+	# Returns the ?p ?o bindings of the subject in the SPARQL JSON results format, as the endpoint does
+	# subject : URI between angle brackets, e.g. <http://dbpedia.org/resource/Barack_Obama>
+	def getBindings(self,subject):
+		number = self.terms.find(subject)
+		if(number<0):
+			return []
+
+		bindings = []
+		start,end = self.getRange(self.spo,(number,))
+		for i in range(start,end):
+			bindings.append({'p':getBinding(self.terms.get(self.spo[3*i+1])),'o':getBinding(self.terms.get(self.spo[3*i+2]))})
+		return bindings
+
+	# Returns the subjects having the object for the predicate (POS index)
+	def getSubjects(self,predicate,object):
+		predicateNumber = self.terms.find(predicate)
+		objectNumber = self.terms.find(object)
+		if(predicateNumber<0 or objectNumber<0):
+			return []
+
+		start,end = self.getRange(self.pos,(predicateNumber,objectNumber))
+		return [self.terms.get(self.pos[3*i+2]) for i in range(start,end)]
+
+	def close(self):
+		self.spo.release()
+		self.pos.release()
+		self.terms.close()
+		self.mmap.close()
+		self.file.close()
+
+	# Builds a store from an N-Triples file (optionally gzipped)
+	def build(inputPath,outputPath):
+		terms = {}						# key:term  value:number in the order the terms were read
+		triples = array('I')
+
+		for triple in readNTriples(inputPath):
+			for term in triple:
+				triples.append(terms.setdefault(term,len(terms)))
+
+		# Renumber the terms in sorted order
+		sortedTerms = sortStrings(terms)
+		numbers = array('I',bytes(4*len(terms)))
+		for number,term in enumerate(sortedTerms):
+			numbers[terms[term]] = number
+
+		spo = sorted(set((numbers[triples[i]],numbers[triples[i+1]],numbers[triples[i+2]]) for i in range(0,len(triples),3)))
+		pos = sorted((p,o,s) for s,p,o in spo)
+
+		with open(outputPath,'wb') as output:
+			output.write(TripleStore.magic)
+			output.write(array('Q',[len(spo)]).tobytes())
+			StringTable.write(output,sortedTerms)
+			for index in (spo,pos):
+				output.write(array('I',(number for triple in index for number in triple)).tobytes())
+				writePadding(output)
+
+		return len(spo)
+
+
+# N-Triples parsing
+
+# A term : URI, blank node or literal with an optional language tag or datatype
+termPattern = re.compile(r'<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:@[A-Za-z0-9-]+|\^\^<[^>]*>)?')
+escapePattern = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)')
+escapes = {'t':'\t','b':'\b','n':'\n','r':'\r','f':'\f','"':'"',"'":"'",'\\':'\\'}
+
+# Yields the (subject,predicate,object) of the lines of an N-Triples file, as written in the file
+# Lines that are not triples are skipped
+def readNTriples(path):
+	openFile = gzip.open if path.endswith('.gz') else open
+	with openFile(path,'rt',encoding='utf-8') as ntriplesFile:
+		for line in ntriplesFile:
+			triple = termPattern.findall(line)
+			if(len(triple)==3):
+				yield tuple(triple)
+
+# Replaces an escape sequence of a literal by its character
+def unescapeMatch(match):
+	escape = match.group(1)
+	if(len(escape)>1):
+		return chr(int(escape[1:],16))
+	return escapes.get(escape,escape)
+
+def unescape(value):
+	return escapePattern.sub(unescapeMatch,value)
+
+# Returns the SPARQL JSON binding of a term
+def getBinding(term):
+	if(term[0]=='<'):
+		return {'type':'uri','value':term[1:-1]}
+	if(term[0]=='_'):
+		return {'type':'bnode','value':term[2:]}
+
+	end = term.rindex('"')
+	binding = {'type':'literal','value':unescape(term[1:end])}
+	if(term[end+1:end+2]=='@'):
+		binding['xml:lang'] = term[end+2:]
+	elif(term[end+1:end+3]=='^^'):
+		binding['datatype'] = term[end+4:-1]
+	return binding
+
+
+if __name__ == '__main__':
+	count = TripleStore.build(sys.argv[1],sys.argv[2])
+	print(str(count)+' triples stored in '+sys.argv[2])
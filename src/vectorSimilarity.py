@@ -0,0 +1,109 @@
+import sys
+import numpy
+
+# Local semantic similarity backed by a word-vector matrix (word2vec, GloVe, fastText ...)
+#
+# Two formats are understood :
+#	- text : one word per line followed by its vector ("word 0.12 -0.5 ..."). The optional word2vec
+#	  header line ("count dimension") is skipped
+#	- numpy : a .npy matrix with the words in a .vocab file next to it (one word per line, same order
+#	  as the rows). The matrix is memory mapped so large models load instantly. Use the main method of
+#	  this module to convert a text model.
+#
+# The vector of a phrase is the mean of the unit vectors of its words. The cosine similarity of every
+# (keyword, predicate) pair is computed with a single matrix product and scaled to the 0-3 scores
+# used by WordSimilarity.isPredicateSimilar
+class VectorSimilarity:
+
+	# Cosine similarities at or above these values get a scaled score of 2 and 3, scores below 2 are returned as -1 (not similar)
+	thresholds = (0.45,0.6)
+
+	def __init__(self,words,matrix):
+		self.matrix = matrix											# One row per word
+		self.index = {}													# key:word  value:row of the word in the matrix
+		for row,word in enumerate(words):
+			if word not in self.index:
+				self.index[word] = row
+
+	# Loads a model from a text or a numpy file
+	def load(path):
+		if(path.endswith('.npy')):
+			matrix = numpy.load(path,mmap_mode='r')
+			with open(path[:-4]+'.vocab',encoding='utf-8') as vocabFile:
+				words = [line.rstrip('\n') for line in vocabFile]
+			return VectorSimilarity(words,matrix)
+
+		words = []
+		vectors = []
+		with open(path,encoding='utf-8',errors='replace') as vectorFile:
+			for line in vectorFile:
+				values = line.rstrip().split(' ')
+				# word2vec header
+				if(len(values)==2 and len(words)==0):
+					continue
+				words.append(values[0])
+				vectors.append(values[1:])
+
+		return VectorSimilarity(words,numpy.asarray(vectors,dtype=numpy.float32))
+
+	# Saves the model in the numpy format
+	def save(self,path):
+		words = sorted(self.index,key=lambda word: self.index[word])
+		rows = [self.index[word] for word in words]
+
+		numpy.save(path,numpy.asarray(self.matrix[rows],dtype=numpy.float32))
+		with open(path[:-4]+'.vocab','w',encoding='utf-8') as vocabFile:
+			for word in words:
+				vocabFile.write(word+'\n')
+
+	# Returns the unit vector of a phrase, None if none of its words are known
+	def getPhraseVector(self,phrase):
+		rows = [self.index[token] for token in phrase.lower().split() if token in self.index]
+		if(len(rows)==0):
+			return None
+
+		vectors = numpy.asarray(self.matrix[rows],dtype=numpy.float32)
+		vectors = vectors / numpy.maximum(numpy.linalg.norm(vectors,axis=1,keepdims=True),1e-12)
+		vector = vectors.mean(axis=0)
+		norm = numpy.linalg.norm(vector)
+		if(norm==0):
+			return None
+		return vector/norm
+
+	# Stacks the unit vectors of the phrases, unknown phrases get a null vector
+	def getPhraseMatrix(self,phrases):
+		phraseMatrix = numpy.zeros((len(phrases),self.matrix.shape[1]),dtype=numpy.float32)
+		for row,phrase in enumerate(phrases):
+			vector = self.getPhraseVector(phrase)
+			if vector is not None:
+				phraseMatrix[row] = vector
+		return phraseMatrix
+
+	# Returns the cosine similarities of the keywords (rows) and the predicates (columns)
+	def getCosineMatrix(self,keywords,predicates):
+		return numpy.dot(self.getPhraseMatrix(keywords),self.getPhraseMatrix(predicates).T)
+
+	# Scores every (keyword,predicate) pair at once
+	# Returns a dictionary  key:(keyword,predicate)  value:scaled score
+	def getScaledScores(self,keywords,predicates):
+		scores = {}
+		if(len(keywords)==0 or len(predicates)==0):
+			return scores
+
+		cosineMatrix = self.getCosineMatrix(keywords,predicates)
+		scaledMatrix = numpy.where(cosineMatrix>=VectorSimilarity.thresholds[1],3,numpy.where(cosineMatrix>=VectorSimilarity.thresholds[0],2,-1)).tolist()
+		for i,keyword in enumerate(keywords):
+			for j,predicate in enumerate(predicates):
+				scores[(keyword,predicate)] = scaledMatrix[i][j]
+		return scores
+
+	# Same contract as WordSimilarity.isPredicateSimilar
+	def isPredicateSimilar(self,word1,word2):
+		return self.getScaledScores([word1],[word2])[(word1,word2)]
+
+
+# Converts a text model into the numpy format
+# python3 vectorSimilarity.py vectors.txt vectors.npy
+if __name__ == '__main__':
+	model = VectorSimilarity.load(sys.argv[1])
+	model.save(sys.argv[2])
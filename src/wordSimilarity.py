@@ -1,57 +1,52 @@
-import urllib.request
 import sys
-import json
 import math
-from urllib.parse import quote
-from threading import Thread
+import threading
+import asyncio
+from similarityClient import SimilarityClient
 
 class WordSimilarity:
 
-	scoreDictionary = {}
-	scoreDictionary['esa'] = 0
-	scoreDictionary['swoogle'] = 0
+	vectorModel = None		# Optional local VectorSimilarity model, replaces the remote services once loaded
+	client = None			# SimilarityClient shared by all the callers, created on first use
+	clientLock = threading.Lock()
+
+	# Returns the shared client of the similarity services
+	def getClient():
+		with WordSimilarity.clientLock:
+			if WordSimilarity.client is None:
+				WordSimilarity.client = SimilarityClient()
+			return WordSimilarity.client
+
+	# Loads a local word-vector model (see vectorSimilarity.py)
+	def loadVectorModel(path):
+		from vectorSimilarity import VectorSimilarity
+		WordSimilarity.vectorModel = VectorSimilarity.load(path)
+
+	# Tells if getBatchScores can score pairs (a local model is loaded)
+	def canScoreBatches():
+		return WordSimilarity.vectorModel is not None
+
+	# Scores every (keyword,predicate) pair in one go when a local model is loaded
+	# Returns a dictionary  key:(keyword,predicate)  value:score as returned by isPredicateSimilar
+	# Returns None when the scores can only be computed pair by pair
+	def getBatchScores(keywords,predicates):
+		if WordSimilarity.vectorModel is None:
+			return None
+		return WordSimilarity.vectorModel.getScaledScores(keywords,predicates)
 
 	# 1 - EasyESA client
 	# a score of 1 and -1 results in a perfect match
 	# treshold values to consider  0.07, 0.052 and 0.04
 	def getEasyESAScore(word1,word2):
-
-		WordSimilarity.scoreDictionary['esa'] = 0
-		url = "http://vmdeb20.deri.ie:8890/esaservice?task=esa&term1="+quote(word1)+'&term2='+quote(word2)
-		try:
-			request = urllib.request.Request(url)
-			response = urllib.request.urlopen(request)
-			score = str(response.read().decode('utf-8')).replace('\"','')
-			WordSimilarity.scoreDictionary['esa'] = float(score)
-		except Exception as e:
-			WordSimilarity.scoreDictionary['esa'] = 0
+		return WordSimilarity.getClient().getScore('esa',word1,word2)
 
 	# 2 - ws4j client
 	def getWs4jScore(word1,word2):
-		url = "http://ws4jdemo.appspot.com/ws4j?measure=wup&args="+quote(word1)+"%3A%3A"+quote(word2)
-		request = urllib.request.Request(url)
-		request.add_header('Accept', 'application/json')
-		response = urllib.request.urlopen(request)
-		responseStr = response.read().decode('utf-8')
-		# fetch json from the response
-		jsonStr = json.loads(responseStr)
-		score = float(jsonStr['result'][0]['score'])
-		return score
+		return WordSimilarity.getClient().getScore('ws4j',word1,word2)
 	
 	# 3 - UMBC Semantic Similarity service
-	#
-	#  Documentation availabel at http://swoogle.umbc.edu/SimService/api.html
 	def getSwoogleScore(word1,word2):
-		WordSimilarity.scoreDictionary['swoogle'] = 0	
-		url = "http://swoogle.umbc.edu/StsService/GetStsSim?operation=api&phrase1="+quote(word1)+'&phrase2='+quote(word2)
-		try:
-			request = urllib.request.Request(url)
-			response = urllib.request.urlopen(request)
-			score = str(response.read().decode('utf-8')).replace('\"','')
-			score = float(score)
-			WordSimilarity.scoreDictionary['swoogle'] = score
-		except Exception as e:
-			WordSimilarity.scoreDictionary['swoogle'] = 0
+		return WordSimilarity.getClient().getScore('swoogle',word1,word2)
 
 
 	# As of now using only EasyESA.
@@ -61,16 +56,35 @@ class WordSimilarity:
 	def isPredicateSimilar(word1,word2):
 		#score = math.fabs(WordSimilarity.getEasyESAScore(word1,word2))
 		        
-	    esaThread = Thread(target=WordSimilarity.getEasyESAScore, args=(word1,word2,))
-	    swoogleThread = Thread(target=WordSimilarity.getSwoogleScore, args=(word1,word2,))
+	    if WordSimilarity.vectorModel is not None:
+	    	return WordSimilarity.vectorModel.isPredicateSimilar(word1,word2)
+
+	    # Both services are queried at the same time by the workers of the shared client
+	    client = WordSimilarity.getClient()
+	    esaFuture = client.submitScore('esa',word1,word2)
+	    swoogleFuture = client.submitScore('swoogle',word1,word2)
+
+	    return WordSimilarity.getScaledScore(esaFuture.result(),swoogleFuture.result())
+
+	# asyncio variants, the requests go through the asyncio client 'http' (see asyncHttp.py)
+	async def getEasyESAScoreAsync(word1,word2,http):
+		return await WordSimilarity.getClient().getScoreAsync('esa',word1,word2,http)
+
+	async def getSwoogleScoreAsync(word1,word2,http):
+		return await WordSimilarity.getClient().getScoreAsync('swoogle',word1,word2,http)
+
+	async def isPredicateSimilarAsync(word1,word2,http):
+		if WordSimilarity.vectorModel is not None:
+			return WordSimilarity.vectorModel.isPredicateSimilar(word1,word2)
+
+		ESAscore,SwoogleScore = await asyncio.gather(WordSimilarity.getEasyESAScoreAsync(word1,word2,http),WordSimilarity.getSwoogleScoreAsync(word1,word2,http))
+		return WordSimilarity.getScaledScore(ESAscore,SwoogleScore)
 
-	    esaThread.start()
-	    swoogleThread.start()
-	    esaThread.join()
-	    swoogleThread.join()
+	# Combines the scores of EasyESA and Swoogle into a score between 1 and 3
+	# Returns -1 when the words are not similar
+	def getScaledScore(ESAscore,SwoogleScore):
 
-	    ESAscore = WordSimilarity.scoreDictionary['esa'] 
-	    #WordSimilarity.getEasyESAScore(word1,word2)
+	    # EasyESA
 	    ESAScaledScore = 0
 	    if(ESAscore>0 and ESAscore<=0.04):
 	    	ESAScaledScore = 1
@@ -81,8 +95,7 @@ class WordSimilarity:
 	    else:
 	    	ESAScaledScore = 0
 
-	    SwoogleScore = WordSimilarity.scoreDictionary['swoogle'] 
-	    # WordSimilarity.getSwoogleScore(word1,word2)
+	    # Swoogle
 	    SwoogleScaledScore = 0
 	    if(SwoogleScore>0 and SwoogleScore<0.6):
 	    	SwoogleScaledScore = 1